@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+List field formatting benchmark
+===============================
+
+Formats _list fields of a synthetic registry, comparing a per-person formatting loop to the
+cached formatting used in the registry normalization.
+
+Usage:
+
+    python benchmarks/benchmark_list_fields.py [person count] [distinct values]
+
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bpersonnel
+
+
+def synthetic_personnel(count, distinct):
+    return [
+        {
+            'firstname': 'First' + str(index),
+            'lastname': 'Last' + str(index),
+            'coordinator_list': 'Project {a},/projects/{a};Project {b},/projects/{b}'.format(
+                a=index % distinct,
+                b=(index + 1) % distinct
+            ),
+            'teaching_list': ['Course {a},/courses/{a}'.format(a=index % distinct), 'Seminar'],
+            'member_list': 'Group {a},/groups/{a}'.format(a=index % distinct)
+        } for index in range(count)
+    ]
+
+
+def format_uncached(personnel):
+    formatted = []
+    for item in personnel:
+        item = dict(item)
+        for field in item:
+            if field.endswith('_list'):
+                values = item[field]
+                if not isinstance(values, list):
+                    values = [x.strip() for x in values.split(';')]
+
+                field_list = []
+                for i in values:
+                    parts = [x.strip() for x in i.split(',')]
+                    if len(parts) == 2:
+                        field_list.append('<a class="text" href="' + bpersonnel.escape(parts[1]) + '">' + bpersonnel.escape(parts[0], quote=False) + '</a>')
+                    else:
+                        field_list.append(bpersonnel.escape(parts[0], quote=False))
+                item[field] = ', '.join(field_list)
+
+        formatted.append(item)
+
+    return formatted
+
+
+def format_cached(personnel):
+    bpersonnel.format_list_value.cache_clear()
+    return [bpersonnel.format_list_fields(item) for item in personnel]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    personnel = synthetic_personnel(count, distinct)
+
+    print('List field formatting for {count} persons, {distinct} distinct values per field'.format(
+        count=count,
+        distinct=distinct
+    ))
+    print('{name:<12} {duration:>12}'.format(name='Method', duration='Time (ms)'))
+
+    for name, function in [('uncached', format_uncached), ('cached', format_cached)]:
+        duration = min(timeit.repeat(lambda: function(personnel), number=1, repeat=5))
+        print('{name:<12} {duration:>12.3f}'.format(name=name, duration=duration * 1000.0))
+
+    assert format_uncached(personnel) == format_cached(personnel)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Settings resolution benchmark
+=============================
+
+Compares the allocations and time used to resolve div settings on a page with many
+bpersonnel divs, using per-div deep copies of the settings versus layered settings.
+
+Usage:
+
+    python benchmarks/benchmark_settings.py [div count]
+
+"""
+
+import os
+import sys
+import copy
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bpersonnel
+
+
+def div_attributes(count):
+    return [
+        {
+            'class': ['bpersonnel'],
+            'data-set': 'set' + str(index % 10),
+            'data-mode': 'list' if index % 2 else 'panel',
+            'data-fields': 'responsibilities, affiliation.title, email, photo',
+            'data-sort': 'true'
+        } for index in range(count)
+    ]
+
+
+def deepcopy_settings(attrs_list, page_settings):
+    resolved = []
+    for attrs in attrs_list:
+        settings = copy.deepcopy(page_settings)
+        for name in bpersonnel.bpersonnel_div_parameters['bpersonnel']:
+            key = 'data-source' if name == 'source' else name
+            settings[key] = attrs.get('data-' + name, page_settings[key])
+
+        settings['fields'] = bpersonnel.parse_fields(settings['fields'])
+        settings['sort'] = bpersonnel.parse_bool(settings['sort'])
+        resolved.append(settings)
+
+    return resolved
+
+
+def layered_settings(attrs_list, page_settings):
+    return [
+        bpersonnel.div_settings(attrs, page_settings, bpersonnel.bpersonnel_div_parameters['bpersonnel'])
+        for attrs in attrs_list
+    ]
+
+
+def measure(function, attrs_list, page_settings, repeat=20):
+    tracemalloc.start()
+    resolved = function(attrs_list, page_settings)
+    allocated, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resolved
+
+    duration = min(timeit.repeat(lambda: function(attrs_list, page_settings), number=1, repeat=repeat))
+    return allocated, peak, duration
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    attrs_list = div_attributes(count)
+
+    page_settings = copy.deepcopy(bpersonnel.bpersonnel_default_settings)
+
+    print('Settings resolution for page with {count} divs'.format(count=count))
+    print('{name:<12} {allocated:>14} {peak:>14} {duration:>12}'.format(
+        name='Method', allocated='Retained (kB)', peak='Peak (kB)', duration='Time (ms)'
+    ))
+
+    for name, function in [('deepcopy', deepcopy_settings), ('layered', layered_settings)]:
+        allocated, peak, duration = measure(function, attrs_list, page_settings)
+        print('{name:<12} {allocated:>14.1f} {peak:>14.1f} {duration:>12.3f}'.format(
+            name=name,
+            allocated=allocated / 1024.0,
+            peak=peak / 1024.0,
+            duration=duration * 1000.0
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite
+===============
+
+Generates synthetic personnel registries (persons with nested affiliations, _list fields and
+many sets) and page corpora with varying amount of bpersonnel and bpersonnel-item divs, and
+measures registry loading, listing and card rendering, and the content hook end-to-end.
+
+Results are reported per benchmark as min / max / mean / stddev / median over rounds. Results
+can be stored as JSON and compared against an earlier run to catch performance regressions, the
+script exits with status 1 when a benchmark is slower than the given threshold.
+
+Usage:
+
+    python benchmarks/benchmark_suite.py [--sizes 100,1000,10000] [--rounds 5]
+                                         [--json results.json] [--compare baseline.json]
+                                         [--threshold 0.2] [--filter name]
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import types
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bpersonnel
+
+
+def synthetic_person(index):
+    person = {
+        'firstname': 'First' + str(index),
+        'lastname': 'Last' + str(index),
+        'email': 'person{index}@example.org'.format(index=index),
+        'homepage': 'http://example.org/~person{index}'.format(index=index),
+        'photo': 'images/person{index}.jpg'.format(index=index),
+        'affiliation': [
+            {
+                'title': 'University {a}'.format(a=index % 20),
+                'abbreviation': 'U{a}'.format(a=index % 20),
+                'department': 'Department {a}'.format(a=index % 7),
+                'url': 'http://u{a}.example.org'.format(a=index % 20)
+            }
+        ],
+        'coordinator_list': 'Project {a},/projects/{a};Project {b},/projects/{b}'.format(
+            a=index % 50,
+            b=(index + 1) % 50
+        ),
+        'teaching_list': ['Course {a},/courses/{a}'.format(a=index % 30), 'Seminar']
+    }
+
+    if index % 3 == 0:
+        person['affiliation'].append({
+            'title': 'Institute {a}'.format(a=index % 5),
+            'abbreviation': 'I{a}'.format(a=index % 5),
+            'department': None,
+            'url': None
+        })
+
+    return person
+
+
+def synthetic_registry(count, set_count=None, set_size=None):
+    """
+    Synthetic registry with count persons and set_count sets of set_size members
+    """
+
+    set_count = set_count or max(1, count // 10)
+    set_size = set_size or min(count, 20)
+
+    sets = {}
+    for set_index in range(set_count):
+        members = []
+        for member_index in range(set_size):
+            index = (set_index * 7 + member_index * 13) % count
+            member = {
+                'firstname': 'First' + str(index),
+                'lastname': 'Last' + str(index),
+                'responsibilities': 'Task {a}'.format(a=member_index % 4)
+            }
+            if member_index == 0:
+                member['main'] = True
+            if member_index % 5 == 0:
+                member['coordinator_list'] = 'Set project {a},/sets/{a}'.format(a=set_index)
+            members.append(member)
+
+        sets['set' + str(set_index)] = members
+
+    return {
+        'personnel': [synthetic_person(index) for index in range(count)],
+        'sets': sets
+    }
+
+
+def synthetic_page(source, registry, div_count, item_count):
+    """
+    Synthetic page html with div_count listing divs and item_count person card divs
+    """
+
+    set_names = sorted(registry['sets'])
+    count = len(registry['personnel'])
+
+    divs = []
+    for index in range(div_count):
+        divs.append(
+            '<div class="bpersonnel" data-source="{source}" data-set="{set}" data-mode="{mode}" '
+            'data-sort="{sort}" data-fields="responsibilities, affiliation.title, email, photo, coordinator_list"></div>'.format(
+                source=source,
+                set=set_names[index % len(set_names)],
+                mode='list' if index % 2 else 'panel',
+                sort='true' if index % 3 else 'false'
+            )
+        )
+
+    for index in range(item_count):
+        person = (index * 17) % count
+        divs.append(
+            '<div class="bpersonnel-item" data-source="{source}" data-person-firstname="First{person}" '
+            'data-person-lastname="Last{person}" data-fields="affiliation.title, email, photo, teaching_list"></div>'.format(
+                source=source,
+                person=person
+            )
+        )
+
+    return '<h1>Page</h1>\n<p>' + 'Lorem ipsum dolor sit amet. ' * 20 + '</p>\n' + '\n<p>Text</p>\n'.join(divs)
+
+
+class Content(object):
+    """
+    Minimal content object for the content hook
+    """
+
+    def __init__(self, html, title):
+        self._content = html
+        self.title = title
+        self.source_path = title
+        self.metadata = {}
+
+
+def configure(settings=None):
+    """
+    Initialize plugin settings as done at pelican initialization
+    """
+
+    pelican_settings = {'SITEURL': 'http://example.org'}
+    pelican_settings.update(settings or {})
+    bpersonnel.init_default_config(types.SimpleNamespace(settings=pelican_settings))
+
+
+def clear_caches():
+    bpersonnel.clear_registry_cache()
+    bpersonnel.bpersonnel_fragment_cache.clear()
+
+
+def measure(function, setup=None, rounds=5, warmup=1):
+    """
+    Run function for the given amount of rounds, setup is called before each round and excluded
+    from the measurement
+    """
+
+    for _ in range(warmup):
+        if setup:
+            setup()
+        function()
+
+    durations = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    return {
+        'rounds': rounds,
+        'min': min(durations),
+        'max': max(durations),
+        'mean': statistics.mean(durations),
+        'stddev': statistics.stdev(durations) if len(durations) > 1 else 0.0,
+        'median': statistics.median(durations)
+    }
+
+
+def listing_settings(source, set_name, mode='panel'):
+    return bpersonnel.div_settings(
+        {
+            'data-source': source,
+            'data-set': set_name,
+            'data-mode': mode,
+            'data-fields': 'responsibilities, affiliation.title, email, photo, coordinator_list'
+        },
+        bpersonnel.process_page_metadata({}),
+        bpersonnel.bpersonnel_div_parameters['bpersonnel']
+    )
+
+
+def card_settings(source, index):
+    return bpersonnel.div_settings(
+        {
+            'data-source': source,
+            'data-person-firstname': 'First' + str(index),
+            'data-person-lastname': 'Last' + str(index),
+            'data-fields': 'affiliation.title, email, photo, teaching_list'
+        },
+        bpersonnel.process_page_metadata({}),
+        bpersonnel.bpersonnel_div_parameters['bpersonnel-item']
+    )
+
+
+def benchmarks(path, size):
+    """
+    Benchmark cases for registry of given size, yields (name, function, setup)
+    """
+
+    registry = synthetic_registry(size)
+    source = os.path.join(path, 'personnel{size}.yaml'.format(size=size))
+    with open(source, 'w') as file:
+        yaml.safe_dump(registry, file)
+
+    set_name = 'set0'
+    all_persons = listing_settings(source, None)
+    set_persons = listing_settings(source, set_name, mode='list')
+    card = card_settings(source, size // 2)
+
+    def load_registry():
+        return bpersonnel.load_personnel_registry(source=source)
+
+    def clear_fragments():
+        bpersonnel.bpersonnel_fragment_cache.clear()
+
+    def warm_registry():
+        clear_fragments()
+        load_registry()
+
+    yield 'load_personnel_registry[{size}]-cold'.format(size=size), load_registry, clear_caches
+    yield 'load_personnel_registry[{size}]-cached'.format(size=size), load_registry, None
+    yield 'generate_listing[{size}]-all'.format(size=size), lambda: bpersonnel.generate_listing(all_persons), warm_registry
+    yield 'generate_listing[{size}]-set'.format(size=size), lambda: bpersonnel.generate_listing(set_persons), warm_registry
+    yield 'generate_listing[{size}]-fragment'.format(size=size), lambda: bpersonnel.generate_listing(set_persons), None
+    yield 'generate_person_card[{size}]'.format(size=size), lambda: bpersonnel.generate_person_card(card), warm_registry
+
+    for div_count, item_count in [(1, 5), (5, 20), (20, 100)]:
+        html = synthetic_page(source, registry, div_count, item_count)
+
+        def hook(html=html):
+            bpersonnel.bpersonnel(Content(html, 'page'))
+
+        name = 'bpersonnel[{size}]-divs{divs}-items{items}'.format(size=size, divs=div_count, items=item_count)
+        yield name + '-cold', hook, clear_caches
+        yield name + '-cached', hook, None
+
+    def corpus():
+        for index in range(50):
+            bpersonnel.bpersonnel(Content('<p>No personnel on page {index}</p>'.format(index=index), 'page'))
+
+    yield 'bpersonnel[{size}]-corpus50-no-markup'.format(size=size), corpus, None
+
+
+def report(results):
+    print('{name:<52} {min:>10} {max:>10} {mean:>10} {stddev:>10} {median:>10} {rounds:>7}'.format(
+        name='Name (time in ms)', min='Min', max='Max', mean='Mean', stddev='StdDev', median='Median', rounds='Rounds'
+    ))
+    for name, result in results.items():
+        print('{name:<52} {min:>10.3f} {max:>10.3f} {mean:>10.3f} {stddev:>10.3f} {median:>10.3f} {rounds:>7}'.format(
+            name=name,
+            min=result['min'] * 1000.0,
+            max=result['max'] * 1000.0,
+            mean=result['mean'] * 1000.0,
+            stddev=result['stddev'] * 1000.0,
+            median=result['median'] * 1000.0,
+            rounds=result['rounds']
+        ))
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against baseline, returns names of regressed benchmarks
+    """
+
+    regressions = []
+    print('')
+    print('{name:<52} {baseline:>12} {current:>12} {change:>9}'.format(
+        name='Comparison (median in ms)', baseline='Baseline', current='Current', change='Change'
+    ))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        change = result['median'] / baseline[name]['median'] - 1.0 if baseline[name]['median'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+
+        print('{name:<52} {baseline:>12.3f} {current:>12.3f} {change:>+8.1%}{flag}'.format(
+            name=name,
+            baseline=baseline[name]['median'] * 1000.0,
+            current=result['median'] * 1000.0,
+            change=change,
+            flag=flag
+        ))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pelican-bpersonnel benchmark suite')
+    parser.add_argument('--sizes', default='100,1000,10000', help='comma separated registry sizes')
+    parser.add_argument('--rounds', type=int, default=5, help='measured rounds per benchmark')
+    parser.add_argument('--filter', default=None, help='run only benchmarks containing this text')
+    parser.add_argument('--json', default=None, help='store results into JSON file')
+    parser.add_argument('--compare', default=None, help='compare results against JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown when comparing')
+    args = parser.parse_args()
+
+    configure()
+
+    path = tempfile.mkdtemp(prefix='bpersonnel-benchmark-')
+    results = {}
+    try:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            for name, function, setup in benchmarks(path, size):
+                if args.filter and args.filter not in name:
+                    continue
+
+                results[name] = measure(function, setup=setup, rounds=args.rounds)
+
+    finally:
+        shutil.rmtree(path)
+
+    report(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'machine_info': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform()
+                },
+                'bpersonnel': bpersonnel.__version__,
+                'benchmarks': results
+            }, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['benchmarks']
+
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,36 @@ Author: Toni Heittola (toni.heittola@gmail.com)
 
 import os
 import logging
-import copy
+import hashlib
+import re
+import uuid
+import pickle
+import functools
+import json
+import keyword
+import glob
+import sys
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import threading
+import time
+from html import escape
 from bs4 import BeautifulSoup
-from jinja2 import Template
+from jinja2 import Environment, FunctionLoader, BytecodeCache, FileSystemBytecodeCache
 from pelican import signals, contents
+import shutil
 import yaml
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 import collections
+import collections.abc
 from io import open
 
 logger = logging.getLogger(__name__)
@@ -31,7 +55,7 @@ bpersonnel_default_settings = {
                 <h3 class="panel-title">{{header}}</h3>
               </div>
               {% endif %}
-              <table class="table bpersonnel-container">
+              <table class="table bpersonnel-container"{% if paginated %} data-bpersonnel-items{% endif %}>
               {{list}}
               </table>
             </div>
@@ -39,7 +63,7 @@ bpersonnel_default_settings = {
         'list': """
             {% if header %}<h3 class="section-heading text-center">{{header}}</h3>{% endif %}
             <div class="list-group bpersonnel-container">
-                <div class="row" style="display:flex;display:-webkit-flex;flex-wrap:wrap;">
+                <div class="row" style="display:flex;display:-webkit-flex;flex-wrap:wrap;"{% if paginated %} data-bpersonnel-items{% endif %}>
                 {{list}}
                 </div>
             </div>
@@ -49,7 +73,7 @@ bpersonnel_default_settings = {
             <tr>
                 {% if photo %}
                 <td class="{{item_css}}" style="width: 65px;">
-                <img class="img img-circle" src="{{site_url}}/{{ photo }}" alt="{{firstname}} {{lastname}}" width="48px">
+                <img class="img img-circle" src="{{site_url}}/{{ photo_thumbnail or photo }}"{% if photo_thumbnail_2x %} srcset="{{site_url}}/{{ photo_thumbnail }} 1x, {{site_url}}/{{ photo_thumbnail_2x }} 2x"{% endif %} alt="{{firstname}} {{lastname}}" width="48px">
                 </td>
                 {% endif %}
                 <td class="{{item_css}}">
@@ -114,7 +138,7 @@ bpersonnel_default_settings = {
                 <div class="row list-group-item-" style="padding-bottom:0.5em;">
                     {% if photo %}
                     <div class="col-md-2 col-xs-2">
-                        <img class="img img-circle" src="{{site_url}}/{{ photo }}" alt="{{firstname}} {{lastname}}" width="55px">
+                        <img class="img img-circle" src="{{site_url}}/{{ photo_thumbnail or photo }}"{% if photo_thumbnail_2x %} srcset="{{site_url}}/{{ photo_thumbnail }} 1x, {{site_url}}/{{ photo_thumbnail_2x }} 2x"{% endif %} alt="{{firstname}} {{lastname}}" width="55px">
                     </div>
                     {% endif %}
                     <div class="col-md-8 col-xs-8">
@@ -174,6 +198,18 @@ bpersonnel_default_settings = {
                 </div>
             </div>
         """},
+    'group-template': {
+        'panel': """
+            <tr><th colspan="2">{{group}}</th></tr>
+        """,
+        'list': """
+            <div class="col-md-12 col-xs-12"><h4>{{group}}</h4></div>
+        """},
+    'pagination-template': """
+        <div class="bpersonnel-more text-center" data-chunks="{{ chunks|join(' ') }}">
+            <button type="button" class="btn btn-default btn-sm" onclick="var more=this.parentNode,chunks=more.getAttribute('data-chunks').split(' '),url=chunks.shift(),listing=more.previousElementSibling,items=listing.matches('[data-bpersonnel-items]')?listing:listing.querySelector('[data-bpersonnel-items]')||listing.querySelector('.bpersonnel-container');more.setAttribute('data-chunks',chunks.join(' '));fetch(url).then(function(response){return response.text();}).then(function(html){var chunk=document.createElement('template');chunk.innerHTML=html;items.appendChild(chunk.content);if(!chunks.length){more.parentNode.removeChild(more);}});">Show more ({{ remaining }})</button>
+        </div>
+    """,
     'person-item-template': """
         <h4><strong>{{firstname}} {{lastname}}</strong></h4>
         {% if title %}
@@ -219,7 +255,7 @@ bpersonnel_default_settings = {
             </div>
             <div class="col-md-2">
                 {% if photo %}
-                <img class="img img-rounded" src="{{site_url}}/{{ photo }}" alt="{{firstname}} {{lastname}}" height="120px" width="120px">
+                <img class="img img-rounded" src="{{site_url}}/{{ photo_thumbnail or photo }}"{% if photo_thumbnail_2x %} srcset="{{site_url}}/{{ photo_thumbnail }} 1x, {{site_url}}/{{ photo_thumbnail_2x }} 2x"{% endif %} alt="{{firstname}} {{lastname}}" height="120px" width="120px">
                 {% endif %}
             </div>
         </div>
@@ -230,441 +266,3268 @@ bpersonnel_default_settings = {
     'template-variable': False,
     'person-firstname': None,
     'person-lastname': None,
+    'person-key': None,
+    'person-field': None,
+    'person-value': None,
     'sort': False,
-    'fields': '',
+    'filter': (),
+    'group-by': None,
+    'page-size': 0,
+    'chunk-path': 'bpersonnel',
+    'output-path': None,
+    'fields': [],
     'site-url': '',
+    'registry-hash': False,
+    'normalize-html': False,
+    'fragment-cache-size': 256,
+    'disk-cache-path': None,
+    'compiled-registry': False,
+    'render-workers': 0,
+    'timing': False,
+    'timing-report-file': None,
+    'dependency-cache-path': None,
+    'thumbnail-size': None,
+    'card-thumbnail-size': 120,
+    'thumbnail-format': None,
+    'thumbnail-quality': 85,
+    'thumbnail-retina': False,
+    'thumbnail-workers': 4,
+    'thumbnail-path': 'images/bpersonnel',
+    'thumbnail-source-path': '',
+    'thumbnail-cache-path': None,
+    'thumbnail-output-path': None,
+    'warmup': False,
+    'warmup-scan-path': None,
+    'warmup-workers': 2,
+    'template-cache-size': 50,
+    'template-bytecode-cache-path': None,
     'debug_processing': False
 }
 
-bpersonnel_settings = copy.deepcopy(bpersonnel_default_settings)
+# Content metadata parameters and corresponding settings
+bpersonnel_metadata_parameters = collections.OrderedDict([
+    ('bpersonnel_source', 'data-source'),
+    ('bpersonnel_set', 'set'),
+    ('bpersonnel_mode', 'mode'),
+    ('bpersonnel_panel_color', 'panel-color'),
+    ('bpersonnel_header', 'header'),
+    ('bpersonnel_fields', 'fields'),
+    ('bpersonnel_filter', 'filter'),
+    ('bpersonnel_group_by', 'group-by'),
+    ('bpersonnel_page_size', 'page-size'),
+])
+
+# Div parameters (without data- prefix) for each div class
+bpersonnel_div_parameters = {
+    'bpersonnel': (
+        'source', 'set', 'template', 'item-template', 'mode', 'header', 'panel-color', 'fields', 'sort',
+        'filter', 'group-by', 'page-size'
+    ),
+    'bpersonnel-item': (
+        'source', 'set', 'template', 'item-template', 'mode', 'header', 'panel-color',
+        'person-firstname', 'person-lastname', 'person-key', 'person-field', 'person-value', 'fields'
+    )
+}
 
 
-def load_personnel_registry(source):
+def parse_fields(value):
     """
+    Parse fields setting
 
-    :param source: filename of the data file
-    :return: personnel registry
+    :param value: comma separated string or list
+    :return: list
     """
 
-    if source and os.path.isfile(source):
-        try:
-            from distutils.version import LooseVersion
-            if LooseVersion(str(yaml.__version__)) >= "5.1":
-                with open(source, 'r', encoding='utf-8') as field:
-                    personnel_registry = yaml.load(field, Loader=yaml.FullLoader)
-            else:
-                with open(source, 'r', encoding='utf-8') as field:
-                    personnel_registry = yaml.load(field)
+    if isinstance(value, str):
+        return [x.strip() for x in value.split(',') if x.strip()]
+    else:
+        return list(value)
 
-            if 'data' in personnel_registry:
-                personnel_registry = personnel_registry['data']
 
-            personnel_data = collections.OrderedDict()
-            set_data = collections.OrderedDict()
-            if 'personnel' in personnel_registry:
-                for item in personnel_registry['personnel']:
-                    for field in item:
-                        if field.endswith('_list'):
-                            if not isinstance(item[field], list):
-                                item[field] = [x.strip() for x in item[field].split(';')]
-
-                            field_list = []
-                            for i in item[field]:
-                                parts = [x.strip() for x in i.split(',')]
-                                if len(parts) == 2:
-                                    field_list.append('<a class="text" href="' + parts[1] + '">' + parts[0] + '</a>')
-                                else:
-                                    field_list.append(parts[0])
-                            item[field] = ', '.join(field_list)
-                    key = item['lastname'].lower().replace(' ','_') + '-' + item['firstname'].lower().replace(' ','_')
-                    personnel_data[key] = item
+def parse_bool(value):
+    """
+    Parse boolean setting
 
-            if 'sets' in personnel_registry:
-                set_data = collections.OrderedDict()
-                for set in personnel_registry['sets']:
-                    set_dict = collections.OrderedDict()
-                    for item in personnel_registry['sets'][set]:
-                        key = item['lastname'].lower().replace(' ', '_') + '-' + item['firstname'].lower().replace(' ','_')
-                        if key in personnel_data:
-                            data = copy.deepcopy(personnel_data[key])
-                            data.update(item)
-                            item.update(data)
-                            for field in item:
-                                if field.endswith('_list'):
-                                    if not isinstance(item[field], list):
-                                        item[field] = [x.strip() for x in item[field].split(';')]
-
-                                    field_list = []
-                                    for i in item[field]:
-                                        parts = [x.strip() for x in i.split(',')]
-                                        if len(parts) == 2:
-                                            field_list.append('<a class="text" href="' + parts[1] + '">' + parts[0] + '</a>')
-                                        else:
-                                            field_list.append(parts[0])
-
-                                    item[field] = ', '.join(field_list)
-
-                            set_dict[key] = item
-                        else:
-                            logger.warn('`pelican-bpersonnel` failed to form set [{set}], person not found firstname=[{firstname}] ,lastname=[{lastname}]'.format(
-                                set=set,
-                                firstname=item['firstname'],
-                                lastname=item['lastname']
-                            ))
-                            return False
-                    set_data[set] = set_dict
+    :param value: bool or string
+    :return: bool
+    """
 
-            return {
-                'personnel': personnel_data,
-                'sets': set_data
-            }
+    return value is True or value == 'True' or value == 'true'
 
-        except ValueError:
-            logger.warn('`pelican-bpersonnel` failed to load file [' + str(source) + ']')
+
+def parse_filter(value):
+    """
+    Parse filter setting, conditions are separated with semicolon and accepted values with vertical
+    bar (e.g. "affiliation.abbreviation=UX1|UX2;title=Professor")
+
+    :param value: string or list of (field, values) tuples
+    :return: tuple of (field, tuple of values)
+    """
+
+    if not value:
+        return ()
+
+    if not isinstance(value, str):
+        return tuple((field, tuple(str(item) for item in values)) for field, values in value)
+
+    conditions = []
+    for condition in value.split(';'):
+        if not condition.strip():
+            continue
+
+        if '=' not in condition:
+            logger.warning('`pelican-bpersonnel` invalid filter condition [{condition}]'.format(condition=condition.strip()))
+            continue
+
+        field, values = condition.split('=', 1)
+        conditions.append((field.strip(), tuple(item.strip() for item in values.split('|'))))
+
+    return tuple(conditions)
+
+
+def parse_page_size(value):
+    """
+    Parse page size setting
+
+    :param value: int or string
+    :return: int, 0 disables pagination
+    """
+
+    if value is None or value == '':
+        return 0
+
+    try:
+        page_size = int(value)
+
+    except (TypeError, ValueError):
+        logger.warning('`pelican-bpersonnel` invalid page size [{value}]'.format(value=value))
+        return 0
+
+    return max(page_size, 0)
+
+
+# Typed parsing for settings given in content metadata and div attributes
+bpersonnel_setting_parsers = {
+    'fields': parse_fields,
+    'sort': parse_bool,
+    'filter': parse_filter,
+    'page-size': parse_page_size
+}
+
+
+def layered_settings(parent, overrides=None):
+    """
+    Create settings layer on top of parent settings. Overrides are parsed into the layer, other
+    settings are resolved from the parent without copying.
+
+    :param parent: parent settings
+    :param overrides: dict of overridden settings
+    :return: settings (ChainMap)
+    """
+
+    layer = {}
+    if overrides:
+        for key, value in overrides.items():
+            if key in bpersonnel_setting_parsers:
+                value = bpersonnel_setting_parsers[key](value)
+            layer[key] = value
+
+    return collections.ChainMap(layer, parent)
+
+
+def div_settings(attrs, parent, parameters):
+    """
+    Create settings layer for div
+
+    :param attrs: div attribute dict
+    :param parent: parent settings
+    :param parameters: div parameters to be used
+    :return: settings (ChainMap)
+    """
+
+    overrides = {}
+    for name in parameters:
+        if 'data-' + name in attrs:
+            overrides['data-source' if name == 'source' else name] = attrs['data-' + name]
+
+    return layered_settings(parent, overrides)
+
+
+# Content pre-scan, matches div elements having class bpersonnel or bpersonnel-item
+bpersonnel_markup_pattern = re.compile(r'<div\b[^>]*\bclass\s*=\s*["\']?[^"\'>]*\bbpersonnel\b', re.IGNORECASE)
+bpersonnel_page_stats = {
+    'processed': 0,
+    'skipped': 0
+}
+
+# Rendered fragments, keyed by registry fingerprint and all settings affecting the output
+bpersonnel_fragment_cache = collections.OrderedDict()
+bpersonnel_fragment_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'evictions': 0
+}
+
+# Persistent cache, normalized registries (keyed by resolved path) and rendered fragments stored
+# on disk between builds
+bpersonnel_disk_cache_format = 4
+bpersonnel_disk_cache = {
+    'registries': {},
+}
+bpersonnel_disk_cache_stats = {
+    'registries_reused': 0,
+    'fragments_loaded': 0
+}
+
+# Process-wide registry cache, keyed by resolved source path
+bpersonnel_registry_cache = {}
+
+# Sharded registries keyed by source (directory or glob pattern), and raw shard data keyed by
+# resolved shard path
+bpersonnel_sharded_registry_cache = {}
+bpersonnel_shard_cache = {}
+
+# Shard filenames per sharded source, listed once per build
+bpersonnel_shard_lists = {}
+bpersonnel_registry_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'invalidations': 0
+}
+
+# Content hashes of registry files with the modification time and size they were computed for
+bpersonnel_registry_digests = {}
+
+# Loading locks per registry source
+bpersonnel_registry_cache_lock = threading.Lock()
+bpersonnel_registry_locks = {}
+
+# Registry warm-up
+bpersonnel_warmup_executor = None
+bpersonnel_warmup_futures = {}
+bpersonnel_source_patterns = [
+    re.compile(r'\bdata-source\s*=\s*["\']([^"\']+)["\']'),
+    re.compile(r'^:?bpersonnel_source:?\s*(\S+)\s*$', re.MULTILINE | re.IGNORECASE),
+    re.compile(r'<meta\s+name=["\']bpersonnel_source["\']\s+content=["\']([^"\']+)["\']', re.IGNORECASE)
+]
+
+
+# Build-time instrumentation, time per phase (total and excluding nested phases), per page and
+# per registry
+bpersonnel_timings = {
+    'phases': {},
+    'pages': {},
+    'registries': {}
+}
+bpersonnel_timing_lock = threading.Lock()
+bpersonnel_timing_state = threading.local()
+
+
+class PhaseTimer(object):
+    """
+    Context manager measuring a processing phase when timing is enabled. Nested phases are
+    subtracted from the self time of the enclosing phase. Set skip to True to leave the measurement
+    out (e.g. cache hit), time is then accounted to the enclosing phase.
+
+    """
+
+    __slots__ = ('phase', 'page', 'registry', 'start', 'children', 'skip')
+
+    def __init__(self, phase, page=None, registry=None):
+        self.phase = phase
+        self.page = page
+        self.registry = registry
+        self.start = None
+        self.children = 0.0
+        self.skip = False
+
+    def __enter__(self):
+        if bpersonnel_global_settings['timing']:
+            if not hasattr(bpersonnel_timing_state, 'stack'):
+                bpersonnel_timing_state.stack = []
+
+            bpersonnel_timing_state.stack.append(self)
+            self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is None:
             return False
 
-    else:
-        logger.warn('`pelican-bpersonnel` failed to load file [' + str(source) + ']')
+        duration = time.perf_counter() - self.start
+        stack = bpersonnel_timing_state.stack
+        stack.pop()
+
+        if not self.skip:
+            if stack:
+                stack[-1].children += duration
+
+            with bpersonnel_timing_lock:
+                phase = bpersonnel_timings['phases'].setdefault(self.phase, {'count': 0, 'total': 0.0, 'self': 0.0})
+                phase['count'] += 1
+                phase['total'] += duration
+                phase['self'] += duration - self.children
+
+                if self.page:
+                    page = bpersonnel_timings['pages'].setdefault(self.page, {'count': 0, 'total': 0.0})
+                    page['count'] += 1
+                    page['total'] += duration
+
+                if self.registry:
+                    registry = bpersonnel_timings['registries'].setdefault(self.registry, {'count': 0, 'total': 0.0})
+                    registry['count'] += 1
+                    registry['total'] += duration
+
         return False
 
 
-def get_attribute(attrs, name, default=None):
+def timing_report(top=10):
     """
-    Get div attribute
-    :param attrs: attribute dict
-    :param name: name field
-    :param default: default value
-    :return: value
+    Get timing report
+
+    :param top: amount of slowest pages and registries included, None for all
+    :return: dict
     """
 
-    if 'data-'+name in attrs:
-        return attrs['data-'+name]
-    else:
-        return default
+    with bpersonnel_timing_lock:
+        return {
+            'phases': copy_timings(bpersonnel_timings['phases']),
+            'pages': copy_timings(bpersonnel_timings['pages'], top=top),
+            'registries': copy_timings(bpersonnel_timings['registries'], top=top)
+        }
 
 
-def generate_person_card(settings):
+def copy_timings(timings, top=None):
     """
-    Generate individual personnel card
+    Copy timings ordered by total time, slowest first
 
-    :param settings: settings dict
-    :return: html content
+    :param timings: timings dict
+    :param top: amount of items included, None for all
+    :return: OrderedDict
     """
 
-    personnel_registry = load_personnel_registry(source=settings['data-source'])
+    items = sorted(timings.items(), key=lambda item: item[1]['total'], reverse=True)
+    if top is not None:
+        items = items[:top]
 
-    if personnel_registry:
-        key = settings['person-lastname'].lower().replace(' ','_') + '-' + settings['person-firstname'].lower().replace(' ','_')
+    return collections.OrderedDict((name, dict(timing)) for name, timing in items)
 
-        if settings['set'] and 'sets' in personnel_registry and settings['set'] in personnel_registry['sets']:
-            if key in personnel_registry['sets'][settings['set']]:
-                person_data = personnel_registry['sets'][settings['set']][key]
-            else:
-                logger.warn(
-                    '`pelican-bpersonnel` failed to form set [{set}], person not found firstname=[{firstname}] ,lastname=[{lastname}]'.format(
-                        set=settings['set'],
-                        firstname=settings['person-firstname'],
-                        lastname=settings['person-lastname']
-                    ))
-                return False
-        else:
-            if key in personnel_registry['personnel']:
-                person_data = personnel_registry['personnel'][key]
-            else:
-                logger.warn(
-                    '`pelican-bpersonnel` failed to find personel information for firstname=[{firstname}] ,lastname=[{lastname}]'.format(
-                        set=settings['set'],
-                        firstname=settings['person-firstname'],
-                        lastname=settings['person-lastname']
-                    ))
-                return False
 
-        valid_fields = [u'firstname', u'lastname']  # default fields
-        valid_fields += settings['fields']          # user defined fields
+def log_timing_report(report):
+    """
+    Log timing report as summary tables
 
-        filtered_fields = person_data.copy()
-        for field in filtered_fields:
-            if isinstance(filtered_fields[field], list):
-                for list_item_id, list_item in enumerate(filtered_fields[field]):
-                    for item in list_item:
-                        if field + '.' + item not in valid_fields:
-                            filtered_fields[field][list_item_id][item] = None
+    :param report: timing report
+    :return: nothing
+    """
 
-            elif field not in valid_fields:
-                filtered_fields[field] = None
+    lines = ['[bpersonnel] timing',
+             '{phase:<20} {count:>8} {total:>12} {self:>12}'.format(phase='Phase', count='Count', total='Total (ms)', self='Self (ms)')]
+    for phase, timing in report['phases'].items():
+        lines.append('{phase:<20} {count:>8} {total:>12.1f} {self:>12.1f}'.format(
+            phase=phase,
+            count=timing['count'],
+            total=timing['total'] * 1000.0,
+            self=timing['self'] * 1000.0
+        ))
+
+    for title, items in [('Page', report['pages']), ('Registry', report['registries'])]:
+        if items:
+            lines.append('{name:<60} {count:>8} {total:>12}'.format(name=title, count='Count', total='Total (ms)'))
+            for name, timing in items.items():
+                lines.append('{name:<60} {count:>8} {total:>12.1f}'.format(
+                    name=name[-60:],
+                    count=timing['count'],
+                    total=timing['total'] * 1000.0
+                ))
+
+    logger.info('\n'.join(lines))
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """
+    In-memory bytecode cache for the plugin template environment, least recently used bytecode is
+    evicted when cache is full
 
-        template = Template(settings['person-item-template'].strip('\t\r\n').replace('&gt;', '>').replace('&lt;', '<'))
+    """
 
-        filtered_fields['site_url'] = settings['site-url']
-        html = BeautifulSoup(template.render(**filtered_fields), "html.parser")
+    def __init__(self, size=50):
+        self.size = size
+        self.cache = collections.OrderedDict()
 
-        return html
-    else:
-        return ''
+    def load_bytecode(self, bucket):
+        code = self.cache.get(bucket.key)
+        if code is not None:
+            self.cache.move_to_end(bucket.key)
+            bucket.bytecode_from_string(code)
 
+    def dump_bytecode(self, bucket):
+        self.cache[bucket.key] = bucket.bytecode_to_string()
+        self.cache.move_to_end(bucket.key)
+        while self.size >= 0 and len(self.cache) > self.size:
+            self.cache.popitem(last=False)
 
-def generate_listing(settings):
+    def clear(self):
+        self.cache.clear()
+
+
+# Template sources, keyed by SHA1 of the normalized source. Sources are needed only while templates
+# are compiled, least recently requested sources are evicted as the compiled templates are.
+bpersonnel_template_sources = collections.OrderedDict()
+bpersonnel_template_cache_stats = {
+    'requests': 0,
+    'loaded': 0
+}
+
+
+def load_template_source(name):
     """
-    Generate personnel listing
+    Template loader for the plugin template environment
 
-    :param settings: settings dict
-    :return: html content
+    :param name: template name (SHA1 of the normalized source)
+    :return: template source
     """
 
-    personnel_registry = load_personnel_registry(source=settings['data-source'])
-    if personnel_registry and 'personnel' in personnel_registry and personnel_registry['personnel']:
-        if 'sets' in personnel_registry and settings['set'] in personnel_registry['sets']:
-            personnel = personnel_registry['sets'][settings['set']]
-        else:
-            personnel = personnel_registry['personnel']
+    bpersonnel_template_cache_stats['loaded'] += 1
+    return bpersonnel_template_sources.get(name)
 
-        if settings['sort']:
-            personnel = collections.OrderedDict(sorted(personnel.items()))
 
-        html = "\n"
-        main_highlight = False
-        for person_key, person in personnel.items():
-            if 'main' in person and person['main']:
-                html += generate_listing_item(person=person, settings=settings) + "\n"
-                main_highlight = True
+def create_template_environment(cache_size=50, bytecode_cache_path=None):
+    """
+    Create jinja2 environment used to compile all plugin templates. Compiled templates are kept in
+    the environment LRU cache, and bytecode in memory (bounded as the template cache) or in given
+    directory.
 
-        for person_key, person in personnel.items():
-            if not 'main' in person or ('main' in person and not person['main']):
-                html += generate_listing_item(person=person, settings=settings, main_highlight=main_highlight) + "\n"
+    :param cache_size: size of compiled template LRU cache, -1 for unbounded
+    :param bytecode_cache_path: directory for the bytecode cache, if None bytecode is cached in memory
+    :return: jinja2 environment
+    """
 
-        html += "\n"
+    if bytecode_cache_path:
+        if not os.path.isdir(bytecode_cache_path):
+            os.makedirs(bytecode_cache_path)
 
-        template = Template(settings['template'][settings['mode']].strip('\t\r\n').replace('&gt;', '>').replace('&lt;', '<'))
+        bytecode_cache = FileSystemBytecodeCache(directory=bytecode_cache_path, pattern='bpersonnel_%s.cache')
 
-        return BeautifulSoup(template.render(list=html,
-                                             header=settings.get('header'),
-                                             site_url=settings.get('site-url'),
-                                             panel_color=settings.get('panel-color'),), "html.parser")
     else:
-        return ''
+        bytecode_cache = MemoryBytecodeCache(size=cache_size)
 
+    return Environment(
+        loader=FunctionLoader(load_template_source),
+        cache_size=cache_size,
+        bytecode_cache=bytecode_cache
+    )
 
-def generate_listing_item(person, settings, main_highlight=False):
+
+bpersonnel_template_environment = create_template_environment()
+
+
+@functools.lru_cache(maxsize=128)
+def template_hash(source):
     """
+    Get SHA1 hash of the template source
 
-    Generate person in listing
+    :param source: template source
+    :return: hash
+    """
 
-    :param person: person data
-    :param settings: settings dict
-    :return: html content
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def get_template(source):
     """
-    if main_highlight:
-        if settings['mode'] == 'panel':
-            if 'main' in person and person['main']:
-                item_css = 'active'
-            else:
-                item_css = ''
-        else:
-            if 'main' in person and person['main']:
-                item_css = ''
-            else:
-                item_css = 'text-muted'
-    else:
-        item_css = ''
+    Get compiled template through the template cache
 
-    valid_fields = [u'firstname', u'lastname']  # default fields
-    valid_fields += settings['fields']          # user defined fields
+    :param source: template source
+    :return: jinja2 template
+    """
 
-    filtered_fields = person.copy()
-    for field in filtered_fields:
-        if isinstance(filtered_fields[field], list):
-            for list_item_id, list_item in enumerate(filtered_fields[field]):
-                for item in list_item:
-                    if field+'.'+item not in valid_fields:
-                        filtered_fields[field][list_item_id][item] = None
+    source = source.strip('\t\r\n').replace('&gt;', '>').replace('&lt;', '<')
+    name = template_hash(source)
+    bpersonnel_template_sources[name] = source
+    bpersonnel_template_sources.move_to_end(name)
 
-        elif field not in valid_fields:
-            filtered_fields[field] = None
+    # Source of the requested template is always kept
+    size = bpersonnel_global_settings['template-cache-size']
+    while size >= 0 and len(bpersonnel_template_sources) > max(size, 1):
+        bpersonnel_template_sources.popitem(last=False)
 
-    template = Template(settings['item-template'][settings['mode']].strip('\t\r\n').replace('&gt;', '>').replace('&lt;', '<'))
-    filtered_fields['site_url'] = settings['site-url']
-    filtered_fields['item_css'] = item_css
+    bpersonnel_template_cache_stats['requests'] += 1
 
-    html = BeautifulSoup(template.render(**filtered_fields), "html.parser")
-    return html.decode()
+    with PhaseTimer('template-compile') as timer:
+        loaded = bpersonnel_template_cache_stats['loaded']
+        template = bpersonnel_template_environment.get_template(name)
+        timer.skip = loaded == bpersonnel_template_cache_stats['loaded']
 
+    return template
 
-def bpersonnel(content):
+
+def load_disk_cache(path):
     """
-    Main processing
+    Load persistent cache. Cache is discarded if it was stored with another plugin version.
 
+    :param path: cache directory
+    :return: nothing
     """
-    global bpersonnel_settings
 
-    if isinstance(content, contents.Static):
+    filename = os.path.join(path, 'bpersonnel.pickle')
+    if not os.path.isfile(filename):
         return
 
-    soup = BeautifulSoup(content._content, 'html.parser')
+    try:
+        with open(filename, 'rb') as file:
+            data = pickle.load(file)
 
-    # Template variable
-    if bpersonnel_settings['template-variable']:
-        # We have page variable set
-        bpersonnel_settings['show'] = True
-        div_html = generate_listing(settings=bpersonnel_settings)
+    except Exception as e:
+        logger.warning('`pelican-bpersonnel` failed to load cache [{filename}]: {error}'.format(
+            filename=filename,
+            error=e
+        ))
+        return
 
-        if div_html:
-            content.bpersonnel = div_html.decode()
+    if not isinstance(data, dict) or data.get('version') != __version__ or data.get('format') != bpersonnel_disk_cache_format:
+        return
 
-    else:
-        content.bpersonnel = None
+    bpersonnel_disk_cache['registries'] = data['registries']
+    for key, html in data['fragments']:
+        bpersonnel_fragment_cache[key] = html
 
-    # bpersonnel divs
-    bpersonnel_divs = soup.find_all('div', class_='bpersonnel')
-    bpersonnel_item_divs = soup.find_all('div', class_='bpersonnel-item')
+    bpersonnel_listing_chunks.update(data['chunks'])
 
-    if bpersonnel_divs:
-        if bpersonnel_settings['debug_processing']:
-            logger.debug(msg='[{plugin_name}] title:[{title}] divs:[{div_count}]'.format(
-                plugin_name='bpersonnel',
-                title=content.title,
-                div_count=len(bpersonnel_divs)
-            ))
+    bpersonnel_disk_cache_stats['fragments_loaded'] = len(data['fragments'])
+
+
+def save_disk_cache(path):
+    """
+    Store registries loaded with content hash and rendered fragments into persistent cache
 
-        bpersonnel_settings['show'] = True
+    :param path: cache directory
+    :return: nothing
+    """
 
-        for bpersonnel_div in bpersonnel_divs:
-            # We have div in the page
-            settings = copy.deepcopy(bpersonnel_settings)
-            settings['data-source'] = get_attribute(bpersonnel_div.attrs, 'source', bpersonnel_settings['data-source'])
-            settings['set'] = get_attribute(bpersonnel_div.attrs, 'set', bpersonnel_settings['set'])
-            settings['template'] = get_attribute(bpersonnel_div.attrs, 'template', bpersonnel_settings['template'])
-            settings['item-template'] = get_attribute(bpersonnel_div.attrs, 'item-template', bpersonnel_settings['item-template'])
-            settings['mode'] = get_attribute(bpersonnel_div.attrs, 'mode', bpersonnel_settings['mode'])
-            settings['header'] = get_attribute(bpersonnel_div.attrs, 'header', bpersonnel_settings['header'])
-            settings['panel-color'] = get_attribute(bpersonnel_div.attrs, 'panel-color', bpersonnel_settings['panel-color'])
-            settings['fields'] = get_attribute(bpersonnel_div.attrs, 'fields', bpersonnel_settings['fields'])
+    registries = {}
+    for source, cached in bpersonnel_registry_cache.items():
+        if cached['registry'] and cached['fingerprint'][2]:
+            registries[source] = {
+                'fingerprint': cached['registry']['fingerprint'],
+                'registry': cached['registry']
+            }
 
-            if isinstance(settings['fields'], str):
-                settings['fields'] = [x.strip() for x in settings['fields'].split(',')]
+    data = {
+        'version': __version__,
+        'format': bpersonnel_disk_cache_format,
+        'registries': registries,
+        'fragments': list(bpersonnel_fragment_cache.items()),
+        'chunks': dict((key, chunks) for key, chunks in bpersonnel_listing_chunks.items() if key in bpersonnel_fragment_cache)
+    }
 
-            if not isinstance(settings['fields'], list):
-                settings['fields'] = [x.strip() for x in settings['fields'].split(',')]
+    if not os.path.isdir(path):
+        os.makedirs(path)
 
-            settings['sort'] = get_attribute(bpersonnel_div.attrs, 'sort', bpersonnel_settings['sort'])
+    filename = os.path.join(path, 'bpersonnel.pickle')
+    try:
+        with open(filename, 'wb') as file:
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
 
-            if settings['sort'] == 'True' or settings['sort'] == 'true':
-                settings['sort'] = True
+    except Exception as e:
+        logger.warning('`pelican-bpersonnel` failed to store cache [{filename}]: {error}'.format(
+            filename=filename,
+            error=e
+        ))
 
-            else:
-                settings['sort'] = False
-
-            div_html = generate_listing(settings=settings)
-            if div_html:
-                bpersonnel_div.replaceWith(div_html)
-
-    # bpersonnel card divs
-    if bpersonnel_item_divs:
-        if bpersonnel_settings['debug_processing']:
-            logger.debug(msg='[{plugin_name}] title:[{title}] divs:[{div_count}]'.format(
-                plugin_name='bpersonnel-item',
-                title=content.title,
-                div_count=len(bpersonnel_item_divs)
-            ))
 
-        bpersonnel_settings['show'] = True
+def scan_registry_sources(path):
+    """
+    Scan content files for registry sources given in data-source attributes and bpersonnel_source
+    metadata
+
+    :param path: content directory
+    :return: set of registry sources
+    """
+
+    sources = set()
+    for root, directories, files in os.walk(path):
+        for filename in files:
+            if os.path.splitext(filename)[1].lower() not in ('.md', '.markdown', '.mkd', '.rst', '.html', '.htm'):
+                continue
+
+            try:
+                with open(os.path.join(root, filename), 'r', encoding='utf-8') as file:
+                    text = file.read()
+
+            except (IOError, UnicodeDecodeError):
+                continue
+
+            if 'bpersonnel' not in text:
+                continue
+
+            for pattern in bpersonnel_source_patterns:
+                sources.update(pattern.findall(text))
+
+    return sources
+
+
+def warmup_registry(source):
+    """
+    Load and normalize registry into the registry cache. Shards of sharded registries are read as
+    well, as they are otherwise read lazily while rendering.
+
+    :param source: registry source
+    :return: nothing
+    """
+
+    with PhaseTimer('warmup', registry=source):
+        personnel_registry = load_personnel_registry(
+            source=source,
+            content_hash=bpersonnel_global_settings['registry-hash'],
+            compiled=bpersonnel_global_settings['compiled-registry']
+        )
+
+        if isinstance(personnel_registry, ShardedRegistry):
+            personnel_registry.load_all()
 
-        for bpersonnel_card_div in bpersonnel_item_divs:
-            # We have div in the page
-            settings = copy.deepcopy(bpersonnel_settings)
-            settings['data-source'] = get_attribute(bpersonnel_card_div.attrs, 'source', bpersonnel_settings['data-source'])
-            settings['set'] = get_attribute(bpersonnel_card_div.attrs, 'set', bpersonnel_settings['set'])
-            settings['template'] = get_attribute(bpersonnel_card_div.attrs, 'template', bpersonnel_settings['template'])
-            settings['item-template'] = get_attribute(bpersonnel_card_div.attrs, 'item-template', bpersonnel_settings['item-template'])
-            settings['mode'] = get_attribute(bpersonnel_card_div.attrs, 'mode', bpersonnel_settings['mode'])
-            settings['header'] = get_attribute(bpersonnel_card_div.attrs, 'header', bpersonnel_settings['header'])
-            settings['panel-color'] = get_attribute(bpersonnel_card_div.attrs, 'panel-color', bpersonnel_settings['panel-color'])
-            settings['person-firstname'] = get_attribute(bpersonnel_card_div.attrs, 'person-firstname', bpersonnel_settings['person-firstname'])
-            settings['person-lastname'] = get_attribute(bpersonnel_card_div.attrs, 'person-lastname', bpersonnel_settings['person-lastname'])
-            settings['fields'] = get_attribute(bpersonnel_card_div.attrs, 'fields', bpersonnel_settings['fields'])
 
-            if not isinstance(settings['fields'], list):
-                settings['fields'] = [x.strip() for x in settings['fields'].split(',')]
+def warmup_registries(sources, scan_path=None):
+    """
+    Submit registries to be loaded in the warm-up threads. Already submitted sources are skipped.
 
-            div_html = generate_person_card(settings=settings)
+    :param sources: registry sources
+    :param scan_path: content directory scanned for more registry sources
+    :return: nothing
+    """
 
-            if div_html:
-                bpersonnel_card_div.replaceWith(div_html)
+    if scan_path:
+        sources = set(sources) | scan_registry_sources(scan_path)
 
-    content._content = soup.decode()
+    for source in sorted(sources):
+        if source not in bpersonnel_warmup_futures and (registry_shards(source) or os.path.isfile(source)):
+            bpersonnel_warmup_futures[source] = bpersonnel_warmup_executor.submit(warmup_registry, source)
 
 
-def process_page_metadata(generator, metadata):
+def start_registry_warmup(sources, scan_path=None, workers=2):
     """
-    Process page metadata
+    Start loading registries in background threads, page processing waits for a registry only if it
+    is still being loaded
 
+    :param sources: registry sources
+    :param scan_path: content directory scanned for more registry sources
+    :param workers: amount of threads
+    :return: nothing
     """
-    global bpersonnel_default_settings, bpersonnel_settings
-    bpersonnel_settings = copy.deepcopy(bpersonnel_default_settings)
 
-    if u'bpersonnel' in metadata and (metadata['bpersonnel'] == 'True' or metadata['bpersonnel'] == 'true'):
-        bpersonnel_settings['show'] = True
-        bpersonnel_settings['template-variable'] = True
+    global bpersonnel_warmup_executor
+
+    stop_registry_warmup()
+    bpersonnel_warmup_executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or 1)
+    if scan_path:
+        # Content scan runs also in background, and submits found registries
+        bpersonnel_warmup_futures[None] = bpersonnel_warmup_executor.submit(warmup_registries, sources, scan_path)
     else:
-        bpersonnel_settings['show'] = False
-        bpersonnel_settings['template-variable'] = False
+        warmup_registries(sources)
 
-    if u'bpersonnel_source' in metadata:
-        bpersonnel_settings['data-source'] = metadata['bpersonnel_source']
 
-    if u'bpersonnel_set' in metadata:
-        bpersonnel_settings['set'] = metadata['bpersonnel_set']
+def wait_registry_warmup():
+    """
+    Wait for pending warm-up jobs to finish
 
-    if u'bpersonnel_mode' in metadata:
-        bpersonnel_settings['mode'] = metadata['bpersonnel_mode']
+    :return: nothing
+    """
 
-    if u'bpersonnel_panel_color' in metadata:
-        bpersonnel_settings['panel-color'] = metadata['bpersonnel_panel_color']
+    # Scan job may submit more jobs, wait for it first
+    if None in bpersonnel_warmup_futures:
+        concurrent.futures.wait([bpersonnel_warmup_futures[None]])
 
-    if u'bpersonnel_header' in metadata:
-        bpersonnel_settings['header'] = metadata['bpersonnel_header']
+    concurrent.futures.wait(list(bpersonnel_warmup_futures.values()))
 
-    if u'bpersonnel_fields' in metadata:
-        bpersonnel_settings['fields'] = metadata['bpersonnel_fields']
-        bpersonnel_settings['fields'] = [x.strip() for x in bpersonnel_settings['fields'].split(',')]
 
-    if u'bpersonnel_sort' in metadata and (metadata['bpersonnel_sort'] == 'True' or metadata['bpersonnel_sort'] == 'true'):
-        bpersonnel_settings['sort'] = True
+def stop_registry_warmup():
+    """
+    Wait for warm-up threads to finish and report failures
 
+    :return: nothing
+    """
 
-def init_default_config(pelican):
+    global bpersonnel_warmup_executor
+
+    if bpersonnel_warmup_executor is not None:
+        wait_registry_warmup()
+
+        for source, future in list(bpersonnel_warmup_futures.items()):
+            error = future.exception()
+            if error is not None:
+                logger.warning('`pelican-bpersonnel` failed to load registry [{source}] in warm-up: {error}'.format(
+                    source=source if source is not None else 'content scan',
+                    error=error
+                ))
+
+        bpersonnel_warmup_executor.shutdown()
+        bpersonnel_warmup_executor = None
+
+    bpersonnel_warmup_futures.clear()
+
+
+def registry_fingerprint(source, content_hash=False):
     """
-    Handle settings from pelicanconf.py
+    Get fingerprint of the registry file used to validate cached registries. Content hash is
+    computed again only when file modification time or size has changed.
+
+    :param source: filename of the data file
+    :param content_hash: include SHA1 hash of the file content
+    :return: tuple (mtime, size, hash)
+    """
+
+    stat = os.stat(source)
+    digest = None
+    if content_hash:
+        path = os.path.realpath(source)
+        cached = bpersonnel_registry_digests.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            digest = cached[2]
+
+        else:
+            with open(source, 'rb') as file:
+                digest = hashlib.sha1(file.read()).hexdigest()
+
+            bpersonnel_registry_digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+
+    return stat.st_mtime_ns, stat.st_size, digest
+
 
+def clear_registry_cache(source=None):
     """
-    global bpersonnel_default_settings, bpersonnel_settings
+    Invalidate cached registries
 
-    bpersonnel_default_settings['site-url'] = pelican.settings['SITEURL']
+    :param source: filename of the data file, if None whole cache is cleared
+    :return: nothing
+    """
 
-    if 'BPERSONNEL_SOURCE' in pelican.settings:
-        bpersonnel_default_settings['data-source'] = pelican.settings['BPERSONNEL_SOURCE']
+    if source is None:
+        bpersonnel_registry_cache_stats['invalidations'] += len(bpersonnel_registry_cache) + len(bpersonnel_sharded_registry_cache)
+        bpersonnel_registry_cache.clear()
+        bpersonnel_sharded_registry_cache.clear()
+        bpersonnel_shard_cache.clear()
+        bpersonnel_shard_lists.clear()
+        bpersonnel_registry_digests.clear()
 
-    if 'BPERSONNEL_TEMPLATE' in pelican.settings:
-        bpersonnel_default_settings['template'].update(pelican.settings['BPERSONNEL_TEMPLATE'])
+    elif source in bpersonnel_sharded_registry_cache:
+        bpersonnel_registry_cache_stats['invalidations'] += 1
+        del bpersonnel_sharded_registry_cache[source]
+        bpersonnel_shard_lists.pop(source, None)
 
-    if 'BPERSONNEL_ITEM_TEMPLATE' in pelican.settings:
-        bpersonnel_default_settings['item-template'].update(pelican.settings['BPERSONNEL_ITEM_TEMPLATE'])
+    elif os.path.realpath(source) in bpersonnel_registry_cache:
+        bpersonnel_registry_cache_stats['invalidations'] += 1
+        del bpersonnel_registry_cache[os.path.realpath(source)]
+        bpersonnel_registry_digests.pop(os.path.realpath(source), None)
 
-    if 'BPERSONNEL_PERSON_ITEM_TEMPLATE' in pelican.settings:
-        bpersonnel_default_settings['person-item-template'] = pelican.settings['BPERSONNEL_PERSON_ITEM_TEMPLATE']
 
-    if 'BPERSONNEL_HEADER' in pelican.settings:
-        bpersonnel_default_settings['header'] = pelican.settings['BPERSONNEL_HEADER']
+def registry_lock(source):
+    """
+    Get lock for loading the registry, registries can be loaded concurrently by the warm-up threads
+    and page processing
 
-    if 'BPERSONNEL_PANEL_COLOR' in pelican.settings:
-        bpersonnel_default_settings['panel-color'] = pelican.settings['BPERSONNEL_PANEL_COLOR']
+    :param source: registry source
+    :return: lock
+    """
 
-    if 'BPERSONNEL_SORT' in pelican.settings:
-        bpersonnel_default_settings['sort'] = pelican.settings['BPERSONNEL_SORT']
+    with bpersonnel_registry_cache_lock:
+        if source not in bpersonnel_registry_locks:
+            bpersonnel_registry_locks[source] = threading.Lock()
 
-    if 'BPERSONNEL_DEBUG_PROCESSING' in pelican.settings:
-        bpersonnel_default_settings['debug_processing'] = pelican.settings['BPERSONNEL_DEBUG_PROCESSING']
+        return bpersonnel_registry_locks[source]
+
+
+def load_personnel_registry(source, content_hash=False, compiled=False):
+    """
+    Load personnel registry through the registry cache. Registry file is parsed only if it is not yet
+    cached or it has been changed (mtime, size and optionally content hash) since it was cached.
+    Directory or glob pattern given as source is loaded as sharded registry. Registry being loaded
+    in another thread is waited for, and then taken from the cache.
+
+    :param source: filename of the data file, directory or glob pattern of YAML shards
+    :param content_hash: validate cached registry also with content hash
+    :param compiled: use compiled registry
+    :return: personnel registry
+    """
+
+    with registry_lock(source):
+        shards = registry_shards(source) if source else None
+        if shards:
+            return load_sharded_registry(source=source, shards=shards, content_hash=content_hash, compiled=compiled)
+
+        elif source and os.path.isfile(source):
+            path = os.path.realpath(source)
+            fingerprint = registry_fingerprint(path, content_hash=content_hash)
+
+            cached = bpersonnel_registry_cache.get(path)
+            if cached and cached['fingerprint'] == fingerprint:
+                bpersonnel_registry_cache_stats['hits'] += 1
+                return cached['registry']
+
+            bpersonnel_registry_cache_stats['misses'] += 1
+
+            # Registry fingerprint, content hash if available as registry output depends only on the content
+            registry_id = fingerprint[2] or (path,) + fingerprint
+
+            stored = bpersonnel_disk_cache['registries'].get(path)
+            if stored and fingerprint[2] and stored['fingerprint'] == registry_id:
+                bpersonnel_disk_cache_stats['registries_reused'] += 1
+                personnel_registry = stored['registry']
+
+            else:
+                with PhaseTimer('normalization', registry=path):
+                    personnel_registry = parse_personnel_registry(source=path, compiled=compiled, fingerprint=registry_id)
 
-    bpersonnel_settings = copy.deepcopy(bpersonnel_default_settings)
+            bpersonnel_registry_cache[path] = {
+                'fingerprint': fingerprint,
+                'registry': personnel_registry
+            }
+            return personnel_registry
+
+        else:
+            logger.warn('`pelican-bpersonnel` failed to load file [' + str(source) + ']')
+            return False
+
+
+def compiled_registry_filename(source):
+    """
+    Get filename of the compiled registry stored alongside the registry file
+
+    :param source: filename of the data file
+    :return: filename
+    """
+
+    return os.path.splitext(source)[0] + '.compiled.json'
+
+
+def read_registry_file(source, compiled=False):
+    """
+    Read registry data from YAML file. YAML is parsed with libyaml when available. If compiled
+    registry is used, data is read from JSON file stored alongside the YAML file, and JSON file
+    is regenerated when the YAML file changes. Values without JSON type (e.g. dates) are stored
+    as strings, as they are rendered in templates.
+
+    :param source: filename of the data file
+    :param compiled: use compiled registry
+    :return: registry data
+    """
+
+    if compiled:
+        stat = os.stat(source)
+        compiled_filename = compiled_registry_filename(source)
+        if os.path.isfile(compiled_filename):
+            try:
+                with open(compiled_filename, 'r', encoding='utf-8') as file:
+                    compiled_registry = json.load(file)
+
+                if compiled_registry.get('source-mtime') == stat.st_mtime_ns and compiled_registry.get('source-size') == stat.st_size:
+                    return compiled_registry['data']
+
+            except (OSError, ValueError, AttributeError, KeyError):
+                pass
+
+    with open(source, 'r', encoding='utf-8') as file:
+        data = yaml.load(file, Loader=YAMLLoader)
+
+    if compiled:
+        try:
+            with open(compiled_filename, 'w', encoding='utf-8') as file:
+                json.dump({
+                    'source-mtime': stat.st_mtime_ns,
+                    'source-size': stat.st_size,
+                    'data': data
+                }, file, default=str)
+
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning('`pelican-bpersonnel` failed to store compiled registry [{filename}]: {error}'.format(
+                filename=compiled_filename,
+                error=e
+            ))
+            if os.path.isfile(compiled_filename):
+                os.remove(compiled_filename)
+
+    return data
+
+
+def person_key(item):
+    """
+    Get person key
+
+    :param item: person data
+    :return: key
+    """
+
+    return sys.intern(item['lastname'].lower().replace(' ', '_') + '-' + item['firstname'].lower().replace(' ', '_'))
+
+
+@functools.lru_cache(maxsize=4096)
+def format_list_value(value):
+    """
+    Format value of the _list field into list of links. Value is either string in format
+    `[title1],[link1];[title2],[link2]` or tuple of `[title],[link]` strings. Formatted values are
+    cached, so each distinct value is formatted only once.
+
+    :param value: field value
+    :return: html content
+    """
+
+    if not isinstance(value, tuple):
+        value = [x.strip() for x in value.split(';')]
+
+    field_list = []
+    for i in value:
+        parts = [x.strip() for x in i.split(',')]
+        if len(parts) == 2:
+            field_list.append('<a class="text" href="' + escape(parts[1]) + '">' + escape(parts[0], quote=False) + '</a>')
+        else:
+            field_list.append(escape(parts[0], quote=False))
+
+    return ', '.join(field_list)
+
+
+def format_list_fields(item):
+    """
+    Format fields ending with _list into list of links
+
+    :param item: person data
+    :return: formatted copy of person data
+    """
+
+    formatted = dict(item)
+    for field, value in item.items():
+        if field.endswith('_list') and value:
+            formatted[field] = format_list_value(tuple(value) if isinstance(value, list) else value)
+
+    return formatted
+
+
+def set_record(person, item):
+    """
+    Form set member record, set item fields are layered over the base person record. Fields set
+    in the set item override person fields.
+
+    :param person: base person record
+    :param item: set item
+    :return: PersonRecord
+    """
+
+    return PersonRecord(key=person.key, data=LayeredMapping(freeze(format_list_fields(item)), person.data))
+
+
+def parse_personnel_registry(source, compiled=False, fingerprint=None):
+    """
+    Parse and normalize personnel registry file
+
+    :param source: filename of the data file
+    :param compiled: use compiled registry
+    :param fingerprint: registry fingerprint
+    :return: personnel registry
+    """
+
+    if source and os.path.isfile(source):
+        try:
+            with PhaseTimer('registry-read'):
+                personnel_registry = read_registry_file(source=source, compiled=compiled)
+
+            if 'data' in personnel_registry:
+                personnel_registry = personnel_registry['data']
+
+            personnel_data = collections.OrderedDict()
+            set_data = collections.OrderedDict()
+            if 'personnel' in personnel_registry:
+                for item in personnel_registry['personnel']:
+                    key = person_key(item)
+                    personnel_data[key] = PersonRecord(key=key, data=format_list_fields(item))
+
+            if 'sets' in personnel_registry:
+                set_data = collections.OrderedDict()
+                for set in personnel_registry['sets']:
+                    set_items = []
+                    for item in personnel_registry['sets'][set]:
+                        key = person_key(item)
+                        if key in personnel_data:
+                            set_items.append((key, item))
+                        else:
+                            logger.warn('`pelican-bpersonnel` failed to form set [{set}], person not found firstname=[{firstname}] ,lastname=[{lastname}]'.format(
+                                set=set,
+                                firstname=item['firstname'],
+                                lastname=item['lastname']
+                            ))
+                            return False
+                    set_data[set] = tuple(set_items)
+
+            return PersonnelRegistry(
+                personnel=FrozenMapping(personnel_data),
+                set_items=set_data,
+                fingerprint=fingerprint,
+                source=source
+            )
+
+        except ValueError:
+            logger.warn('`pelican-bpersonnel` failed to load file [' + str(source) + ']')
+            return False
+
+    else:
+        logger.warn('`pelican-bpersonnel` failed to load file [' + str(source) + ']')
+        return False
+
+
+class FrozenMapping(collections.abc.Mapping):
+    """
+    Immutable, hashable and picklable mapping used to hold registry data. Registries are shared
+    between all pages (and worker processes), hence they can not be modified while rendering.
+
+    """
+
+    __slots__ = ('_data', '_hash')
+
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __repr__(self):
+        return 'FrozenMapping(' + repr(self._data) + ')'
+
+    def __reduce__(self):
+        return FrozenMapping, (self._data,)
+
+
+def freeze(value):
+    """
+    Convert nested dicts and lists into FrozenMappings and tuples
+
+    :param value: value
+    :return: frozen value
+    """
+
+    if isinstance(value, dict):
+        return FrozenMapping((key, freeze(item)) for key, item in value.items())
+
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+
+    else:
+        return value
+
+
+# Global settings, defaults combined with settings from pelicanconf.py. Settings are replaced as a
+# whole when plugin is initialized, and never modified in place.
+bpersonnel_global_settings = freeze(bpersonnel_default_settings)
+
+
+def field_selection(fields):
+    """
+    Get frozen set of valid fields
+
+    :param fields: list of user defined fields, or comma separated string
+    :return: frozenset
+    """
+
+    if isinstance(fields, str):
+        fields = [x.strip() for x in fields.split(',') if x.strip()]
+
+    return frozenset([u'firstname', u'lastname']).union(fields)
+
+
+class PersonRecord(object):
+    """
+    Render-ready person record. Person data is frozen, and field projections are immutable views
+    computed once per distinct field selection and cached in the record.
+
+    """
+
+    __slots__ = ('key', 'data', 'main', 'projections')
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = freeze(data)
+        self.main = bool(data.get('main'))
+        self.projections = {}
+
+    def project(self, fields):
+        """
+        Get person data where fields not selected are set to None
+
+        :param fields: list of user defined fields
+        :return: FrozenMapping
+        """
+
+        valid_fields = field_selection(fields)
+        projection = self.projections.get(valid_fields)
+        if projection is None:
+            projection = {}
+            for field, value in self.data.items():
+                if isinstance(value, tuple):
+                    projection[field] = tuple(
+                        FrozenMapping((item, list_item[item] if field + '.' + item in valid_fields else None) for item in list_item)
+                        if isinstance(list_item, FrozenMapping) else list_item
+                        for list_item in value
+                    )
+
+                elif field in valid_fields:
+                    projection[field] = value
+
+                else:
+                    projection[field] = None
+
+            projection = FrozenMapping(projection)
+            self.projections[valid_fields] = projection
+
+        return projection
+
+
+class LayeredMapping(collections.abc.Mapping):
+    """
+    Immutable mapping layering sparse overrides over a base mapping
+
+    """
+
+    __slots__ = ('overrides', 'base')
+
+    def __init__(self, overrides, base):
+        self.overrides = overrides
+        self.base = base
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.base[key]
+
+    def __iter__(self):
+        for key in self.base:
+            yield key
+
+        for key in self.overrides:
+            if key not in self.base:
+                yield key
+
+    def __len__(self):
+        return len(self.base) + sum(1 for key in self.overrides if key not in self.base)
+
+    def __reduce__(self):
+        return LayeredMapping, (self.overrides, self.base)
+
+
+def field_values(data, field):
+    """
+    Get values of the field, nested fields in lists are given with dot notation (e.g. affiliation.title)
+
+    :param data: person data
+    :param field: field name
+    :return: list of values
+    """
+
+    if field in data:
+        value = data[field]
+        return list(value) if isinstance(value, tuple) else [value]
+
+    if '.' in field:
+        field, item = field.split('.', 1)
+        values = []
+        for list_item in data.get(field) or ():
+            if isinstance(list_item, collections.abc.Mapping) and list_item.get(item) is not None:
+                values.append(list_item[item])
+        return values
+
+    return []
+
+
+class BaseRegistry(collections.abc.Mapping):
+    """
+    Personnel registry, mapping with personnel, sets and fingerprint. Person keys are interned
+    once, and per-field indices are formed on first lookup.
+
+    """
+
+    def __init__(self, personnel, sets, fingerprint=None, source=None):
+        self.source = source
+        self.data = {
+            'personnel': personnel,
+            'sets': sets,
+            'fingerprint': fingerprint
+        }
+        self.field_indices = {}
+        self.orderings = {}
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def field_index(self, field, set=None):
+        """
+        Get index from field values to person keys. Index is formed once per field and scope.
+
+        :param field: field name
+        :param set: set name, index is formed from set specific data, None for all personnel
+        :return: dict
+        """
+
+        if (set, field) not in self.field_indices:
+            records = self.data['sets'][set] if set is not None else self.data['personnel']
+            index = {}
+            for key, record in records.items():
+                for value in field_values(record.data, field):
+                    index.setdefault(str(value), []).append(key)
+
+            self.field_indices[(set, field)] = dict((value, tuple(keys)) for value, keys in index.items())
+
+        return self.field_indices[(set, field)]
+
+    def positions(self, set=None, sort=False):
+        """
+        Get positions of persons in listing order
+
+        :param set: set name
+        :param sort: sort persons by key
+        :return: dict, person key -> position
+        """
+
+        if set is None or set not in self.data['sets']:
+            set = None
+
+        if ('positions', set, sort) not in self.orderings:
+            persons, main_highlight = self.ordering(set=set, sort=sort)
+            self.orderings[('positions', set, sort)] = dict((record.key, position) for position, record in enumerate(persons))
+
+        return self.orderings[('positions', set, sort)]
+
+    def listing(self, set=None, sort=False, filter=(), group_by=None):
+        """
+        Get persons of the listing, filtered and grouped through field indices. Listing is formed
+        once per set, sort, filter and grouping.
+
+        :param set: set name, if set is not found all personnel is used
+        :param sort: sort persons by key, groups are sorted by value
+        :param filter: tuple of conditions (field, accepted values), all conditions have to match
+        :param group_by: field name used for grouping
+        :return: tuple (groups, listing has main persons), groups is tuple of (group value, person
+            records), group value is None for persons without value and for ungrouped listing
+        """
+
+        if set is None or set not in self.data['sets']:
+            set = None
+
+        filter = tuple(filter or ())
+        listing_key = ('listing', set, sort, filter, group_by)
+        if listing_key not in self.orderings:
+            ordered, main_highlight = self.ordering(set=set, sort=sort)
+            persons = ordered
+            groups = ((None, persons),)
+
+            if filter or group_by:
+                positions = self.positions(set=set, sort=sort)
+
+                if filter:
+                    selected = None
+                    for field, values in filter:
+                        index = self.field_index(field, set=set)
+                        keys = frozenset(key for value in values for key in index.get(value, ()))
+                        selected = keys if selected is None else selected & keys
+
+                    persons = tuple(ordered[position] for position in sorted(positions[key] for key in selected))
+                    main_highlight = any(record.main for record in persons)
+
+                else:
+                    selected = positions
+
+                if group_by:
+                    groups = []
+                    grouped = {}
+                    for value, keys in self.field_index(group_by, set=set).items():
+                        members = sorted(positions[key] for key in keys if key in selected)
+                        if members:
+                            groups.append((value, tuple(ordered[position] for position in members)))
+                            grouped.update(dict.fromkeys(keys))
+
+                    if sort:
+                        groups.sort(key=lambda group: group[0])
+                    else:
+                        groups.sort(key=lambda group: positions[group[1][0].key])
+
+                    ungrouped = tuple(record for record in persons if record.key not in grouped)
+                    if ungrouped:
+                        groups.append((None, ungrouped))
+
+                    groups = tuple(groups)
+
+                else:
+                    groups = ((None, persons),)
+
+            self.orderings[listing_key] = (groups, main_highlight)
+
+        return self.orderings[listing_key]
+
+    def ordering(self, set=None, sort=False):
+        """
+        Get persons in listing order, main persons first. Ordering is formed once per set and sort.
+
+        :param set: set name, if set is not found all personnel is used
+        :param sort: sort persons by key
+        :return: tuple (person records, listing has main persons)
+        """
+
+        if set is None or set not in self.data['sets']:
+            set = None
+
+        if (set, sort) not in self.orderings:
+            personnel = self.data['sets'][set] if set is not None else self.data['personnel']
+            items = personnel.items()
+            if sort:
+                items = sorted(items, key=lambda item: item[0])
+
+            records = [record for key, record in items]
+            main = [record for record in records if record.main]
+            self.orderings[(set, sort)] = (
+                tuple(main + [record for record in records if not record.main]),
+                bool(main)
+            )
+
+        return self.orderings[(set, sort)]
+
+    def find(self, field, value):
+        """
+        Find persons by field value
+
+        :param field: field name
+        :param value: field value
+        :return: tuple of person keys
+        """
+
+        return self.field_index(field).get(str(value), ())
+
+    def lookup(self, key=None, firstname=None, lastname=None, field=None, value=None):
+        """
+        Get person key by key, name or field value
+
+        :param key: person key
+        :param firstname: first name
+        :param lastname: last name
+        :param field: field name
+        :param value: field value
+        :return: person key, None if person is not found
+        """
+
+        if key:
+            key = sys.intern(key)
+
+        elif field:
+            keys = self.find(field, value)
+            key = keys[0] if keys else None
+
+        elif firstname and lastname:
+            key = person_key({'firstname': firstname, 'lastname': lastname})
+
+        if key and key in self.data['personnel']:
+            return key
+
+        return None
+
+
+class PersonnelRegistry(BaseRegistry):
+    """
+    Personnel registry formed from a single YAML file. Set members are validated when registry is
+    loaded, but set records are formed only when the set is accessed for the first time.
+
+    """
+
+    def __init__(self, personnel, set_items, fingerprint=None, source=None):
+        super(PersonnelRegistry, self).__init__(
+            personnel=personnel,
+            sets=RegistrySets(self),
+            fingerprint=fingerprint,
+            source=source
+        )
+        self.set_items = set_items
+        self.sets = {}
+
+    def set(self, name):
+        """
+        Get set records
+
+        :param name: set name
+        :return: FrozenMapping of PersonRecords, None if set is not found
+        """
+
+        if name not in self.sets:
+            if name not in self.set_items:
+                return None
+
+            personnel = self.data['personnel']
+            self.sets[name] = FrozenMapping(
+                (key, set_record(personnel[key], item)) for key, item in self.set_items[name]
+            )
+
+        return self.sets[name]
+
+    def set_names(self):
+        return self.set_items.keys()
+
+
+class RegistrySets(collections.abc.Mapping):
+    """
+    Sets view of the registry, sets are formed on first access
+
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __getitem__(self, name):
+        with PhaseTimer('set-merge', registry=self.registry.source) as timer:
+            timer.skip = name in self.registry.sets
+            records = self.registry.set(name)
+
+        if records is None:
+            raise KeyError(name)
+        return records
+
+    def __contains__(self, name):
+        return name in self.registry.set_names()
+
+    def __iter__(self):
+        return iter(list(self.registry.set_names()))
+
+    def __len__(self):
+        return len(self.registry.set_names())
+
+
+def registry_shards(source):
+    """
+    Get shard files for registry source given as directory or glob pattern. Shards are listed once
+    per build, shard files added or removed during the build are noticed in the next build.
+
+    :param source: directory or glob pattern
+    :return: list of filenames, None if source is not sharded
+    """
+
+    if source in bpersonnel_shard_lists:
+        return bpersonnel_shard_lists[source]
+
+    if os.path.isdir(source):
+        filenames = glob.glob(os.path.join(source, '*'))
+
+    elif any(character in source for character in '*?['):
+        filenames = glob.glob(source)
+
+    else:
+        return None
+
+    shards = sorted(
+        filename for filename in filenames
+        if os.path.isfile(filename) and os.path.splitext(filename)[1].lower() in ('.yaml', '.yml')
+    )
+    bpersonnel_shard_lists[source] = shards
+    return shards
+
+
+def read_registry_shard(source, fingerprint, compiled=False):
+    """
+    Read raw registry data of a shard through the shard cache
+
+    :param source: filename of the shard
+    :param fingerprint: shard fingerprint
+    :param compiled: use compiled registry
+    :return: registry data
+    """
+
+    cached = bpersonnel_shard_cache.get(source)
+    if cached and cached['fingerprint'] == fingerprint:
+        return cached['data']
+
+    with PhaseTimer('registry-read', registry=source):
+        data = read_registry_file(source=source, compiled=compiled) or {}
+    if 'data' in data:
+        data = data['data']
+
+    bpersonnel_shard_cache[source] = {
+        'fingerprint': fingerprint,
+        'data': data
+    }
+    return data
+
+
+class ShardedRegistry(BaseRegistry):
+    """
+    Personnel registry formed from multiple YAML shards. Person lookups read shards only until the
+    person is found, and person records are formed only for the people accessed. A set may be
+    defined in any shard, hence set access reads all shards, but forms records only for the set
+    members. Sets defined in multiple shards are merged in shard order.
+
+    """
+
+    def __init__(self, shards, fingerprint, compiled=False, source=None):
+        super(ShardedRegistry, self).__init__(
+            personnel=ShardedPersonnel(self),
+            sets=RegistrySets(self),
+            fingerprint=fingerprint,
+            source=source
+        )
+        self.shards = shards
+        self.compiled = compiled
+        self.loaded_shards = 0
+
+        # Shards may be loaded by warm-up threads while pages are rendered
+        self.lock = threading.Lock()
+
+        self.person_items = collections.OrderedDict()
+        self.set_items = collections.OrderedDict()
+        self.records = {}
+        self.sets = {}
+
+    def load_shard(self):
+        """
+        Read next shard into the person and set indices
+
+        :return: False if all shards are already loaded
+        """
+
+        with self.lock:
+            if self.loaded_shards >= len(self.shards):
+                return False
+
+            source, fingerprint = self.shards[self.loaded_shards]
+            self.loaded_shards += 1
+
+            data = read_registry_shard(source=source, fingerprint=fingerprint, compiled=self.compiled)
+            for item in data.get('personnel') or []:
+                self.person_items.setdefault(person_key(item), item)
+
+            for set, items in (data.get('sets') or {}).items():
+                self.set_items.setdefault(set, []).extend(items)
+
+            return True
+
+    def load_all(self):
+        while self.load_shard():
+            pass
+
+    def person(self, key):
+        """
+        Get person record, shards are read until person is found
+
+        :param key: person key
+        :return: PersonRecord, None if person is not found
+        """
+
+        if key not in self.records:
+            while key not in self.person_items:
+                if not self.load_shard():
+                    return None
+
+            self.records[key] = PersonRecord(key=key, data=format_list_fields(self.person_items[key]))
+
+        return self.records[key]
+
+    def set(self, name):
+        """
+        Get set records, set is merged from all shards. Sets not found are remembered as well, all
+        shards are read only on the first access.
+
+        :param name: set name
+        :return: FrozenMapping of PersonRecords, None if set is not found
+        """
+
+        if name not in self.sets:
+            self.load_all()
+            if name not in self.set_items:
+                self.sets[name] = None
+                return None
+
+            set_dict = collections.OrderedDict()
+            for item in self.set_items[name]:
+                key = person_key(item)
+                if key in self.person_items:
+                    set_dict[key] = set_record(self.person(key), item)
+                else:
+                    logger.warning('`pelican-bpersonnel` failed to form set [{set}], person not found firstname=[{firstname}] ,lastname=[{lastname}]'.format(
+                        set=name,
+                        firstname=item['firstname'],
+                        lastname=item['lastname']
+                    ))
+
+            self.sets[name] = FrozenMapping(set_dict)
+
+        return self.sets[name]
+
+    def set_names(self):
+        self.load_all()
+        return self.set_items.keys()
+
+
+class ShardedPersonnel(collections.abc.Mapping):
+    """
+    Personnel view of the sharded registry
+
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __getitem__(self, key):
+        record = self.registry.person(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key):
+        return self.registry.person(key) is not None
+
+    def __iter__(self):
+        self.registry.load_all()
+        return iter(list(self.registry.person_items))
+
+    def __len__(self):
+        self.registry.load_all()
+        return len(self.registry.person_items)
+
+
+def load_sharded_registry(source, shards, content_hash=False, compiled=False):
+    """
+    Load sharded personnel registry through the registry cache. Cached registry is reused while
+    none of the shards has changed.
+
+    :param source: directory or glob pattern
+    :param shards: list of shard filenames
+    :param content_hash: validate cached registry also with content hash
+    :param compiled: use compiled registry
+    :return: personnel registry
+    """
+
+    shards = [(os.path.realpath(shard), registry_fingerprint(shard, content_hash=content_hash)) for shard in shards]
+    fingerprint = tuple((shard,) + shard_fingerprint for shard, shard_fingerprint in shards)
+
+    cached = bpersonnel_sharded_registry_cache.get(source)
+    if cached and cached['registry']['fingerprint'] == fingerprint:
+        bpersonnel_registry_cache_stats['hits'] += 1
+        return cached['registry']
+
+    bpersonnel_registry_cache_stats['misses'] += 1
+    personnel_registry = ShardedRegistry(shards=shards, fingerprint=fingerprint, compiled=compiled, source=source)
+    bpersonnel_sharded_registry_cache[source] = {
+        'registry': personnel_registry
+    }
+    return personnel_registry
+
+
+bpersonnel_thumbnail_stats = {
+    'photos': 0,
+    'encoded': 0,
+    'reused': 0,
+    'failed': 0
+}
+bpersonnel_thumbnail_formats = {
+    'jpeg': '.jpg',
+    'png': '.png',
+    'webp': '.webp',
+    'gif': '.gif'
+}
+
+
+def thumbnail_key(settings):
+    """
+    Get thumbnail settings affecting the generated html
+
+    :param settings: settings dict
+    :return: tuple, None if thumbnails are disabled
+    """
+
+    if not settings['thumbnail-size']:
+        return None
+
+    return (
+        settings['thumbnail-size'],
+        settings['card-thumbnail-size'],
+        settings['thumbnail-format'],
+        bool(settings['thumbnail-retina']),
+        settings['thumbnail-path']
+    )
+
+
+def thumbnail_filename(photo, size, settings):
+    """
+    Get thumbnail filename relative to the site root
+
+    :param photo: photo filename relative to the site root
+    :param size: thumbnail size in pixels
+    :param settings: settings dict
+    :return: str
+    """
+
+    name, extension = os.path.splitext(photo.lstrip('/'))
+    if settings['thumbnail-format']:
+        extension = bpersonnel_thumbnail_formats[settings['thumbnail-format']]
+
+    return settings['thumbnail-path'] + '/' + name + '-' + str(size) + extension.lower()
+
+
+@functools.lru_cache(maxsize=None)
+def photo_exists(source_path, photo):
+    return os.path.isfile(os.path.join(source_path, photo.lstrip('/')))
+
+
+def photo_thumbnails(photo, settings, size=None):
+    """
+    Get thumbnail template variables for the photo, thumbnails are generated at the end of the build
+
+    :param photo: photo filename relative to the site root
+    :param settings: settings dict
+    :param size: thumbnail size in pixels, None for the listing thumbnail size
+    :return: dict
+    """
+
+    if not photo or not settings['thumbnail-size'] or '://' in photo or not photo_exists(settings['thumbnail-source-path'], photo):
+        return {}
+
+    size = size or settings['thumbnail-size']
+    thumbnails = {
+        'photo_thumbnail': thumbnail_filename(photo, size, settings)
+    }
+    if settings['thumbnail-retina']:
+        thumbnails['photo_thumbnail_2x'] = thumbnail_filename(photo, size * 2, settings)
+
+    return thumbnails
+
+
+def registry_photos(source):
+    """
+    Get photos referenced by the registry, including set specific photos
+
+    :param source: registry source
+    :return: set of photo filenames
+    """
+
+    personnel_registry = load_personnel_registry(
+        source=source,
+        content_hash=bpersonnel_global_settings['registry-hash'],
+        compiled=bpersonnel_global_settings['compiled-registry']
+    )
+    if not personnel_registry:
+        return set()
+
+    photos = set()
+    for records in [personnel_registry['personnel']] + [personnel_registry['sets'][name] for name in personnel_registry['sets']]:
+        for key in records:
+            photo = records[key].data.get('photo')
+            if photo and isinstance(photo, str):
+                photos.add(photo)
+
+    return photos
+
+
+def create_thumbnail(source, target, size, image_format, quality, cache_path):
+    """
+    Create thumbnail through cache. Cached thumbnails are keyed by the photo content and thumbnail
+    parameters, hence unchanged photos are never encoded again.
+
+    :param source: photo file
+    :param target: thumbnail file
+    :param size: thumbnail size in pixels, image is fitted inside size x size box
+    :param image_format: image format, None for the format of the photo
+    :param quality: encoding quality
+    :param cache_path: thumbnail cache directory
+    :return: True if thumbnail was encoded, False if cached thumbnail was used
+    """
+
+    with open(source, 'rb') as file:
+        data = file.read()
+
+    digest = hashlib.sha1(data + repr((size, image_format, quality)).encode('utf-8')).hexdigest()
+    cached = os.path.join(cache_path, digest + os.path.splitext(target)[1])
+
+    encoded = False
+    if not os.path.isfile(cached):
+        with Image.open(source) as image:
+            image_format = (image_format or image.format or 'jpeg').upper()
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            image.thumbnail((size, size), Image.LANCZOS)
+
+            temporary = cached + '.' + uuid.uuid4().hex
+            image.save(temporary, format=image_format, quality=quality)
+
+        os.replace(temporary, cached)
+        encoded = True
+
+    target_path = os.path.dirname(target)
+    if not os.path.isdir(target_path):
+        os.makedirs(target_path, exist_ok=True)
+
+    shutil.copyfile(cached, target)
+    return encoded
+
+
+def generate_thumbnails(sources):
+    """
+    Generate thumbnails for every photo referenced by the registries in a thread pool, and write
+    them into the output directory
+
+    :param sources: registry sources
+    :return: nothing
+    """
+
+    settings = bpersonnel_global_settings
+    cache_path = settings['thumbnail-cache-path']
+    if not os.path.isdir(cache_path):
+        os.makedirs(cache_path)
+
+    photos = set()
+    for source in sources:
+        photos.update(registry_photos(source))
+
+    sizes = set([settings['thumbnail-size'], settings['card-thumbnail-size'] or settings['thumbnail-size']])
+    if settings['thumbnail-retina']:
+        sizes.update([size * 2 for size in sizes])
+
+    jobs = []
+    for photo in sorted(photos):
+        if '://' in photo or not photo_exists(settings['thumbnail-source-path'], photo):
+            continue
+
+        bpersonnel_thumbnail_stats['photos'] += 1
+        for size in sorted(sizes):
+            jobs.append((
+                photo,
+                os.path.join(settings['thumbnail-source-path'], photo.lstrip('/')),
+                os.path.join(settings['thumbnail-output-path'], thumbnail_filename(photo, size, settings)),
+                size
+            ))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=settings['thumbnail-workers'] or 1) as executor:
+        futures = [
+            (photo, executor.submit(create_thumbnail, source, target, size, settings['thumbnail-format'], settings['thumbnail-quality'], cache_path))
+            for photo, source, target, size in jobs
+        ]
+
+        for photo, future in futures:
+            try:
+                if future.result():
+                    bpersonnel_thumbnail_stats['encoded'] += 1
+                else:
+                    bpersonnel_thumbnail_stats['reused'] += 1
+
+            except Exception as e:
+                bpersonnel_thumbnail_stats['failed'] += 1
+                logger.warning('`pelican-bpersonnel` failed to create thumbnail for [{photo}]: {error}'.format(
+                    photo=photo,
+                    error=e
+                ))
+
+
+def get_attribute(attrs, name, default=None):
+    """
+    Get div attribute
+    :param attrs: attribute dict
+    :param name: name field
+    :param default: default value
+    :return: value
+    """
+
+    if 'data-'+name in attrs:
+        return attrs['data-'+name]
+    else:
+        return default
+
+
+# Chunks of paginated listings keyed by fragment key, and listings used in this build
+bpersonnel_listing_chunks = {}
+bpersonnel_listing_chunks_used = set()
+
+
+def fragment_digest(key):
+    """
+    Get digest of the fragment key, stable between processes and builds
+
+    :param key: fragment key
+    :return: str
+    """
+
+    return hashlib.sha1(repr(tuple(
+        tuple(sorted(item)) if isinstance(item, frozenset) else item for item in key
+    )).encode('utf-8')).hexdigest()[:16]
+
+
+def write_listing_chunks(path):
+    """
+    Write chunks of paginated listings used in this build into the output directory, unchanged
+    chunk files are not rewritten
+
+    :param path: output directory
+    :return: nothing
+    """
+
+    for key in bpersonnel_listing_chunks_used:
+        for filename, html in bpersonnel_listing_chunks.get(key, ()):
+            target = os.path.join(path, filename)
+            if os.path.isfile(target):
+                with open(target, 'r', encoding='utf-8') as file:
+                    if file.read() == html:
+                        continue
+
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+
+            with open(target, 'w', encoding='utf-8') as file:
+                file.write(html)
+
+
+def get_fragment(key):
+    """
+    Get rendered fragment from the fragment cache
+
+    :param key: fragment key
+    :return: html content, None if fragment is not cached
+    """
+
+    html = bpersonnel_fragment_cache.get(key)
+    if html is None:
+        bpersonnel_fragment_cache_stats['misses'] += 1
+        return None
+
+    bpersonnel_fragment_cache.move_to_end(key)
+    bpersonnel_fragment_cache_stats['hits'] += 1
+    return html
+
+
+def store_fragment(key, html, size):
+    """
+    Store rendered fragment into the fragment cache, least recently used fragments are evicted
+    when cache is full
+
+    :param key: fragment key
+    :param html: html content
+    :param size: maximum amount of fragments in the cache
+    :return: html content
+    """
+
+    if size:
+        bpersonnel_fragment_cache[key] = html
+        if bpersonnel_worker_fragments is not None:
+            bpersonnel_worker_fragments[key] = html
+
+        while len(bpersonnel_fragment_cache) > size:
+            bpersonnel_fragment_cache.popitem(last=False)
+            bpersonnel_fragment_cache_stats['evictions'] += 1
+
+    return html
+
+
+def normalize_html(html, settings):
+    """
+    Normalize html through BeautifulSoup if normalization is enabled in settings
+
+    :param html: html content
+    :param settings: settings dict
+    :return: html content
+    """
+
+    if settings.get('normalize-html'):
+        return BeautifulSoup(html, 'html.parser').decode()
+    else:
+        return html
+
+
+class FragmentSplicer(object):
+    """
+    Splice rendered html fragments into page. Divs are replaced in the page tree with unique
+    placeholders, and fragments are substituted as strings after the tree is serialized. This way
+    rendered fragments are never parsed.
+
+    """
+
+    def __init__(self):
+        self.prefix = 'bpersonnel-fragment-' + uuid.uuid4().hex + '-'
+        self.fragments = []
+
+    def add(self, html):
+        """
+        Add fragment
+
+        :param html: html content
+        :return: placeholder to be inserted into the page tree
+        """
+
+        self.fragments.append(html)
+        return self.prefix + str(len(self.fragments) - 1)
+
+    def splice(self, html):
+        """
+        Substitute placeholders with fragments
+
+        :param html: serialized page
+        :return: html content
+        """
+
+        if not self.fragments:
+            return html
+
+        return re.sub(
+            re.escape(self.prefix) + r'(\d+)',
+            lambda match: self.fragments[int(match.group(1))],
+            html
+        )
+
+
+def person_description(settings):
+    """
+    Describe person selection for messages
+
+    :param settings: settings dict
+    :return: str
+    """
+
+    if settings['person-key']:
+        return 'key=[{key}]'.format(key=settings['person-key'])
+
+    elif settings['person-field']:
+        return '{field}=[{value}]'.format(field=settings['person-field'], value=settings['person-value'])
+
+    else:
+        return 'firstname=[{firstname}] ,lastname=[{lastname}]'.format(
+            firstname=settings['person-firstname'],
+            lastname=settings['person-lastname']
+        )
+
+
+def generate_person_card(settings):
+    """
+    Generate individual personnel card
+
+    :param settings: settings dict
+    :return: html content
+    """
+
+    personnel_registry = load_personnel_registry(source=settings['data-source'], content_hash=settings['registry-hash'], compiled=settings['compiled-registry'])
+
+    if personnel_registry:
+        key = personnel_registry.lookup(
+            key=settings['person-key'],
+            firstname=settings['person-firstname'],
+            lastname=settings['person-lastname'],
+            field=settings['person-field'],
+            value=settings['person-value']
+        )
+
+        if settings['set'] and 'sets' in personnel_registry and settings['set'] in personnel_registry['sets']:
+            if key in personnel_registry['sets'][settings['set']]:
+                person_data = personnel_registry['sets'][settings['set']][key]
+            else:
+                logger.warn(
+                    '`pelican-bpersonnel` failed to form set [{set}], person not found {person}'.format(
+                        set=settings['set'],
+                        person=person_description(settings)
+                    ))
+                return False
+        else:
+            if key in personnel_registry['personnel']:
+                person_data = personnel_registry['personnel'][key]
+            else:
+                logger.warn(
+                    '`pelican-bpersonnel` failed to find personel information for {person}'.format(
+                        person=person_description(settings)
+                    ))
+                return False
+
+        fragment_key = (
+            'card',
+            personnel_registry['fingerprint'],
+            settings['set'],
+            key,
+            field_selection(settings['fields']),
+            template_hash(settings['person-item-template']),
+            settings['site-url'],
+            bool(settings['normalize-html']),
+            thumbnail_key(settings)
+        )
+        html = get_fragment(fragment_key)
+        if html is not None:
+            return html
+
+        template = get_template(settings['person-item-template'])
+
+        person = person_data.project(settings['fields'])
+        html = normalize_html(html=template.render(person,
+                                                   site_url=settings['site-url'],
+                                                   **photo_thumbnails(person.get('photo'), settings, size=settings['card-thumbnail-size'])), settings=settings)
+
+        return store_fragment(fragment_key, html, settings['fragment-cache-size'])
+    else:
+        return ''
+
+
+def generate_listing(settings):
+    """
+    Generate personnel listing
+
+    :param settings: settings dict
+    :return: html content
+    """
+
+    personnel_registry = load_personnel_registry(source=settings['data-source'], content_hash=settings['registry-hash'], compiled=settings['compiled-registry'])
+    if personnel_registry and 'personnel' in personnel_registry and personnel_registry['personnel']:
+        fragment_key = (
+            'listing',
+            personnel_registry['fingerprint'],
+            settings['set'],
+            settings['mode'],
+            field_selection(settings['fields']),
+            bool(settings['sort']),
+            settings['filter'],
+            settings['group-by'],
+            settings['page-size'],
+            settings.get('header'),
+            settings.get('panel-color'),
+            template_hash(settings['template'][settings['mode']]),
+            template_hash(settings['item-template'][settings['mode']]),
+            template_hash(settings['group-template'][settings['mode']]) if settings['group-by'] else None,
+            template_hash(settings['pagination-template']) if settings['page-size'] else None,
+            settings['site-url'],
+            bool(settings['normalize-html']),
+            thumbnail_key(settings)
+        )
+        html = get_fragment(fragment_key)
+        if html is not None:
+            if fragment_key in bpersonnel_listing_chunks:
+                bpersonnel_listing_chunks_used.add(fragment_key)
+            return html
+
+        groups, main_highlight = personnel_registry.listing(
+            set=settings['set'],
+            sort=bool(settings['sort']),
+            filter=settings['filter'],
+            group_by=settings['group-by']
+        )
+
+        more = ''
+        page_size = settings['page-size']
+        if page_size and sum(len(persons) for group, persons in groups) > page_size:
+            # Listing is split into chunks, first chunk is embedded and the rest are written into
+            # output directory to be loaded on demand
+            items = listing_items(groups=groups, settings=settings, main_highlight=main_highlight)
+            pages = ['\n' + '\n'.join(items[index:index + page_size]) + '\n' for index in range(0, len(items), page_size)]
+            html = pages[0]
+
+            digest = fragment_digest(fragment_key)
+            chunks = tuple(
+                (settings['chunk-path'] + '/' + digest + '-' + str(index) + '.html', page) for index, page in enumerate(pages[1:], 2)
+            )
+            bpersonnel_listing_chunks[fragment_key] = chunks
+            bpersonnel_listing_chunks_used.add(fragment_key)
+
+            more = get_template(settings['pagination-template']).render(
+                chunks=[settings['site-url'] + '/' + filename for filename, chunk in chunks],
+                remaining=len(items) - page_size,
+                page_size=page_size,
+                site_url=settings['site-url']
+            )
+
+        elif settings['group-by']:
+            group_template = get_template(settings['group-template'][settings['mode']])
+            chunks = []
+            for group, persons in groups:
+                if group is not None:
+                    chunks.append(group_template.render(group=group, site_url=settings['site-url']))
+                chunks.extend(render_listing_items(persons=persons, settings=settings, main_highlight=main_highlight))
+
+            html = ''.join(chunks)
+
+        else:
+            html = ''.join(render_listing_items(persons=groups[0][1], settings=settings, main_highlight=main_highlight))
+
+        template = get_template(settings['template'][settings['mode']])
+
+        html = normalize_html(html=template.render(list=html,
+                                                   header=settings.get('header'),
+                                                   site_url=settings.get('site-url'),
+                                                   panel_color=settings.get('panel-color'),
+                                                   paginated=bool(more)) + more, settings=settings)
+
+        return store_fragment(fragment_key, html, settings['fragment-cache-size'])
+    else:
+        return ''
+
+
+def listing_item_css(person, mode, main_highlight=False):
+    """
+    Get CSS class of the person in listing
+
+    :param person: person record
+    :param mode: listing mode
+    :param main_highlight: listing has main persons highlighted
+    :return: CSS class
+    """
+
+    if main_highlight:
+        if mode == 'panel':
+            if person.main:
+                return 'active'
+            else:
+                return ''
+        else:
+            if person.main:
+                return ''
+            else:
+                return 'text-muted'
+    else:
+        return ''
+
+
+def template_variable_name(name):
+    """
+    Check that field can be bound as template variable
+
+    :param name: field name
+    :return: bool
+    """
+
+    return (
+        isinstance(name, str) and name.isidentifier() and not keyword.iskeyword(name)
+        and name.lower() not in ('true', 'false', 'none') and not name.startswith('_bpersonnel')
+    )
+
+
+def listing_items_template(source, names):
+    """
+    Get template rendering all persons of the listing in one pass. Item template is wrapped into a
+    loop over the person records, and person fields are bound as variables for each person, hence
+    item templates are used as such.
+
+    :param source: item template source
+    :param names: field names of the persons
+    :return: jinja2 template
+    """
+
+    bindings = ['{name}=_bpersonnel_person[{key}]'.format(name=name, key=repr(name)) for name in names]
+    bindings.append('item_css=_bpersonnel_css')
+    for name in ('photo_thumbnail', 'photo_thumbnail_2x'):
+        bindings.append('{name}=_bpersonnel_thumbnails[{key}]'.format(name=name, key=repr(name)))
+
+    return get_template(
+        '{% for _bpersonnel_person, _bpersonnel_css, _bpersonnel_thumbnails in _bpersonnel_items %}'
+        '{% with ' + ', '.join(bindings) + ' %}' +
+        source.strip('\t\r\n') +
+        '{% endwith %}\n{% endfor %}'
+    )
+
+
+def render_listing_items(persons, settings, main_highlight=False):
+    """
+    Render persons of the listing in one pass with the item template. Output is streamed and should
+    be joined by the caller.
+
+    :param persons: person records in listing order, main persons first
+    :param settings: settings dict
+    :param main_highlight: listing has main persons highlighted
+    :return: generator of html content
+    """
+
+    fields = settings['fields']
+    mode = settings['mode']
+
+    names = set()
+    for person in persons:
+        names.update(person.project(fields))
+
+    names.difference_update(['site_url', 'item_css', 'photo_thumbnail', 'photo_thumbnail_2x'])
+    template = listing_items_template(
+        source=settings['item-template'][mode],
+        names=sorted(name for name in names if template_variable_name(name))
+    )
+
+    # Main persons are rendered without highlight
+    items = (
+        (data, listing_item_css(person, mode, main_highlight and not person.main), photo_thumbnails(data.get('photo'), settings))
+        for person, data in ((person, person.project(fields)) for person in persons)
+    )
+
+    yield "\n"
+    for chunk in template.generate(_bpersonnel_items=items, site_url=settings['site-url']):
+        yield chunk
+    yield "\n"
+
+
+def generate_listing_item(person, settings, main_highlight=False):
+    """
+
+    Generate person in listing
+
+    :param person: person record
+    :param settings: settings dict
+    :return: html content
+    """
+
+    template = get_template(settings['item-template'][settings['mode']])
+    data = person.project(settings['fields'])
+
+    return template.render(data,
+                           site_url=settings['site-url'],
+                           item_css=listing_item_css(person, settings['mode'], main_highlight),
+                           **photo_thumbnails(data.get('photo'), settings))
+
+
+def listing_items(groups, settings, main_highlight=False):
+    """
+    Render persons of the listing separately, group header is prepended to the first person of the
+    group
+
+    :param groups: tuple of (group value, person records)
+    :param settings: settings dict
+    :param main_highlight: listing has main persons highlighted
+    :return: list of html content
+    """
+
+    group_template = get_template(settings['group-template'][settings['mode']]) if settings['group-by'] else None
+
+    items = []
+    for group, persons in groups:
+        for index, person in enumerate(persons):
+            html = generate_listing_item(person=person, settings=settings, main_highlight=main_highlight and not person.main)
+            if group_template is not None and group is not None and index == 0:
+                html = group_template.render(group=group, site_url=settings['site-url']) + html
+            items.append(html)
+
+    return items
+
+
+# Statistics collected in render worker processes and merged into the main process
+bpersonnel_worker_stats = {
+    'registry': bpersonnel_registry_cache_stats,
+    'template': bpersonnel_template_cache_stats,
+    'fragment': bpersonnel_fragment_cache_stats,
+    'disk': bpersonnel_disk_cache_stats
+}
+
+# Fragments stored during the current job in the render worker process, None in the main process
+bpersonnel_worker_fragments = None
+
+
+def execute_render_job(kind, settings):
+    """
+    Render listing or person card
+
+    :param kind: job kind, 'listing' or 'card'
+    :param settings: settings dict
+    :return: html content
+    """
+
+    with PhaseTimer('render'):
+        if kind == 'card':
+            return generate_person_card(settings=settings)
+        else:
+            return generate_listing(settings=settings)
+
+
+def source_fingerprint(settings):
+    """
+    Get fingerprint of the registry source without loading it
+
+    :param settings: settings dict
+    :return: fingerprint
+    """
+
+    source = settings['data-source']
+    if not source:
+        return None
+
+    shards = registry_shards(source)
+    if shards is None:
+        shards = [source] if os.path.isfile(source) else []
+
+    return tuple(
+        (os.path.realpath(shard),) + registry_fingerprint(shard, content_hash=settings['registry-hash']) for shard in shards
+    )
+
+
+def init_render_worker(settings):
+    """
+    Initialize render worker process
+
+    :param settings: global settings
+    :return: nothing
+    """
+
+    global bpersonnel_global_settings, bpersonnel_template_environment
+    global bpersonnel_registry_cache_lock, bpersonnel_registry_locks, bpersonnel_worker_fragments
+
+    # Locks may have been held by warm-up threads at fork time, forked copies would never be released
+    bpersonnel_registry_cache_lock = threading.Lock()
+    bpersonnel_registry_locks = {}
+
+    bpersonnel_global_settings = settings
+    bpersonnel_template_environment = create_template_environment(
+        cache_size=settings['template-cache-size'],
+        bytecode_cache_path=settings['template-bytecode-cache-path']
+    )
+    bpersonnel_worker_fragments = {}
+
+
+def execute_worker_render_job(job):
+    """
+    Render job in worker process. Registries are loaded once per worker through the registry cache,
+    and cached registry is dropped if its source fingerprint differs from the one seen by the main
+    process.
+
+    Statistics and timings are collected per job, and returned together with the fragments stored
+    during the job to be merged into the main process.
+
+    :param job: tuple (kind, settings, registry source fingerprint)
+    :return: tuple (html content, chunks of paginated listings used, fragments stored, statistics, timings)
+    """
+
+    kind, settings, fingerprint = job
+    source = settings['data-source']
+    if source and bpersonnel_worker_fingerprints.get(source, fingerprint) != fingerprint:
+        clear_registry_cache(source)
+
+    bpersonnel_worker_fingerprints[source] = fingerprint
+    bpersonnel_listing_chunks_used.clear()
+    bpersonnel_worker_fragments.clear()
+    for stats in bpersonnel_worker_stats.values():
+        for stat in stats:
+            stats[stat] = 0
+
+    for timings in bpersonnel_timings.values():
+        timings.clear()
+
+    html = execute_render_job(kind, settings)
+
+    return (
+        html,
+        dict((key, bpersonnel_listing_chunks[key]) for key in bpersonnel_listing_chunks_used),
+        dict(bpersonnel_worker_fragments),
+        dict((name, dict(stats)) for name, stats in bpersonnel_worker_stats.items()),
+        dict((name, copy_timings(timings)) for name, timings in bpersonnel_timings.items())
+    )
+
+
+def merge_worker_results(chunks, fragments, stats, timings):
+    """
+    Merge listing chunks, fragments, statistics and timings returned by a render worker
+
+    :param chunks: chunks of paginated listings used
+    :param fragments: fragments stored
+    :param stats: statistics
+    :param timings: timings
+    :return: nothing
+    """
+
+    bpersonnel_listing_chunks.update(chunks)
+    bpersonnel_listing_chunks_used.update(chunks)
+
+    for key, html in fragments.items():
+        store_fragment(key, html, bpersonnel_global_settings['fragment-cache-size'])
+
+    for name, worker_stats in stats.items():
+        for stat, value in worker_stats.items():
+            bpersonnel_worker_stats[name][stat] += value
+
+    with bpersonnel_timing_lock:
+        for name, worker_timings in timings.items():
+            for key, timing in worker_timings.items():
+                merged = bpersonnel_timings[name].setdefault(key, dict((field, 0) for field in timing))
+                for field, value in timing.items():
+                    merged[field] += value
+
+
+class RenderBackend(object):
+    """
+    Render jobs in the current process
+
+    """
+
+    def render(self, jobs):
+        """
+        Render batch of jobs
+
+        :param jobs: list of tuples (kind, settings)
+        :return: list of html contents
+        """
+
+        return [execute_render_job(kind, settings) for kind, settings in jobs]
+
+    def close(self):
+        pass
+
+
+class ProcessPoolRenderBackend(RenderBackend):
+    """
+    Render jobs in a process pool. Settings are flattened and sent to the workers together with the
+    registry source fingerprint; each worker loads registries once and keeps its own caches.
+
+    Workers are forked, as the plugin is loaded from PLUGIN_PATHS and can not be imported by
+    spawned processes. Where fork is not available, or the pool fails, jobs are rendered in the
+    main process.
+
+    """
+
+    def __init__(self, workers, settings):
+        self.workers = workers
+        self.settings = settings
+        self.executor = None
+        self.disabled = False
+
+    def create_executor(self):
+        """
+        Create process pool with fork start method
+
+        :return: executor, None if fork is not available
+        """
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            logger.warning('`pelican-bpersonnel` render workers require fork start method, rendering in the main process')
+            return None
+
+        # Fork only after warm-up threads have released registry locks and filled the cache
+        wait_registry_warmup()
+
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=init_render_worker,
+            initargs=(self.settings,)
+        )
+
+    def render(self, jobs):
+        if self.executor is None and not self.disabled:
+            self.executor = self.create_executor()
+            self.disabled = self.executor is None
+
+        if self.disabled:
+            return super(ProcessPoolRenderBackend, self).render(jobs)
+
+        batch = [(kind, dict(settings), source_fingerprint(settings)) for kind, settings in jobs]
+        try:
+            rendered = list(self.executor.map(execute_worker_render_job, batch))
+
+        except (concurrent.futures.process.BrokenProcessPool, OSError, pickle.PicklingError, ImportError) as e:
+            logger.warning('`pelican-bpersonnel` render workers failed, rendering in the main process: {error}'.format(
+                error=repr(e)
+            ))
+            self.close()
+            self.disabled = True
+            return super(ProcessPoolRenderBackend, self).render(jobs)
+
+        results = []
+        for html, chunks, fragments, stats, timings in rendered:
+            merge_worker_results(chunks, fragments, stats, timings)
+            results.append(html)
+
+        return results
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+
+bpersonnel_render_backend = RenderBackend()
+
+# Registry source fingerprints seen by the render worker process
+bpersonnel_worker_fingerprints = {}
+
+
+class LazyListing(object):
+    """
+    Listing for the page template variable, rendered when the template outputs it for the first
+    time. Content which never outputs the variable (drafts, summaries, translations) does not
+    render the listing at all.
+
+    """
+
+    __slots__ = ('settings', 'html')
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.html = None
+
+    def render(self):
+        """
+        Render listing, rendered html is memoized
+
+        :return: html content
+        """
+
+        if self.html is None:
+            self.html = execute_render_job('listing', self.settings) or ''
+            self.settings = None
+
+        return self.html
+
+    def __str__(self):
+        return self.render()
+
+    def __html__(self):
+        return self.render()
+
+    def __bool__(self):
+        return bool(self.render())
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        return len(self.render())
+
+    def __eq__(self, other):
+        return str(self) == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return {'settings': self.settings, 'html': self.html}
+
+    def __setstate__(self, state):
+        self.settings = state['settings']
+        self.html = state['html']
+
+    def __repr__(self):
+        return 'LazyListing(' + ('rendered' if self.html is not None else 'pending') + ')'
+
+
+# Registry dependencies of pages, page source path -> {registry source -> set names (None for
+# the whole registry)}, and registry stamps from the previous build
+bpersonnel_dependencies = {
+    'pages': {},
+    'stamps': {}
+}
+bpersonnel_dependency_format = 1
+
+
+def record_dependencies(page, jobs):
+    """
+    Record registries and sets the page depends on
+
+    :param page: page source path
+    :param jobs: list of tuples (kind, settings)
+    :return: nothing
+    """
+
+    if not page:
+        return
+
+    dependencies = {}
+    for kind, settings in jobs:
+        if settings['data-source']:
+            dependencies.setdefault(settings['data-source'], set()).add(settings['set'] or None)
+
+    if dependencies:
+        bpersonnel_dependencies['pages'][page] = dict(
+            (source, frozenset(set_names)) for source, set_names in dependencies.items()
+        )
+    else:
+        bpersonnel_dependencies['pages'].pop(page, None)
+
+
+def page_dependencies(page):
+    """
+    Get registries and sets the page depends on
+
+    :param page: page source path
+    :return: dict, registry source -> frozenset of set names (None for the whole registry)
+    """
+
+    return bpersonnel_dependencies['pages'].get(page, {})
+
+
+def registry_dependents(source, set_name=None):
+    """
+    Get pages depending on the registry or one of its sets. Pages depending on the whole registry
+    are included also when set is given.
+
+    :param source: registry source
+    :param set_name: set name, None for any set
+    :return: list of page source paths
+    """
+
+    pages = []
+    for page, dependencies in bpersonnel_dependencies['pages'].items():
+        if source in dependencies:
+            if set_name is None or set_name in dependencies[source] or None in dependencies[source]:
+                pages.append(page)
+
+    return sorted(pages)
+
+
+def registry_stamp(source, set_name=None):
+    """
+    Get stamp of the registry or set content. Registry is stamped with its fingerprint, sets with
+    the digest of their formed records, hence a set is unchanged as long as its members are. Set not
+    found in the registry is stamped as the whole registry.
+
+    :param source: registry source
+    :param set_name: set name, None for the whole registry
+    :return: stamp, None if registry is not found
+    """
+
+    personnel_registry = load_personnel_registry(
+        source=source,
+        content_hash=bpersonnel_global_settings['registry-hash'],
+        compiled=bpersonnel_global_settings['compiled-registry']
+    )
+    if not personnel_registry:
+        return None
+
+    if set_name is None or set_name not in personnel_registry['sets']:
+        # Listing falls back to the whole personnel when the set is not found
+        return personnel_registry['fingerprint']
+
+    # Canonical JSON, the stamp stays the same whether the registry was read from YAML or from the
+    # compiled registry
+    records = personnel_registry['sets'][set_name]
+    return hashlib.sha1(json.dumps(
+        [(key, records[key].data) for key in records],
+        sort_keys=True,
+        default=lambda value: dict(value) if isinstance(value, collections.abc.Mapping) else str(value)
+    ).encode('utf-8')).hexdigest()
+
+
+def registry_stamps():
+    """
+    Get stamps of all registries and sets pages depend on
+
+    :return: dict, (registry source, set name) -> stamp
+    """
+
+    stamps = {}
+    for dependencies in bpersonnel_dependencies['pages'].values():
+        for source, set_names in dependencies.items():
+            for set_name in set_names:
+                if (source, set_name) not in stamps:
+                    stamps[(source, set_name)] = registry_stamp(source, set_name)
+
+    return stamps
+
+
+def changed_registry_dependents():
+    """
+    Get pages depending on registries or sets changed since the previous build
+
+    :return: set of page source paths
+    """
+
+    pages = set()
+    for page, dependencies in bpersonnel_dependencies['pages'].items():
+        for source, set_names in dependencies.items():
+            for set_name in set_names:
+                key = (source, set_name)
+                if key not in bpersonnel_dependencies['stamps'] or bpersonnel_dependencies['stamps'][key] != registry_stamp(source, set_name):
+                    pages.add(page)
+
+    return pages
+
+
+def load_dependencies(path):
+    """
+    Load registry dependencies stored by the previous build
+
+    :param path: cache directory
+    :return: nothing
+    """
+
+    filename = os.path.join(path, 'bpersonnel_dependencies.pickle')
+    if not os.path.isfile(filename):
+        return
+
+    try:
+        with open(filename, 'rb') as file:
+            data = pickle.load(file)
+
+    except Exception as e:
+        logger.warning('`pelican-bpersonnel` failed to load dependencies [{filename}]: {error}'.format(
+            filename=filename,
+            error=e
+        ))
+        return
+
+    if not isinstance(data, dict) or data.get('version') != __version__ or data.get('format') != bpersonnel_dependency_format:
+        return
+
+    bpersonnel_dependencies['pages'] = data['pages']
+    bpersonnel_dependencies['stamps'] = data['stamps']
+
+
+def save_dependencies(path):
+    """
+    Store registry dependencies of pages together with current registry stamps
+
+    :param path: cache directory
+    :return: nothing
+    """
+
+    # Pages whose source has been removed no longer depend on anything
+    for page in list(bpersonnel_dependencies['pages']):
+        if not os.path.exists(page):
+            del bpersonnel_dependencies['pages'][page]
+
+    data = {
+        'version': __version__,
+        'format': bpersonnel_dependency_format,
+        'pages': bpersonnel_dependencies['pages'],
+        'stamps': registry_stamps()
+    }
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    filename = os.path.join(path, 'bpersonnel_dependencies.pickle')
+    try:
+        with open(filename, 'wb') as file:
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    except Exception as e:
+        logger.warning('`pelican-bpersonnel` failed to store dependencies [{filename}]: {error}'.format(
+            filename=filename,
+            error=e
+        ))
+
+
+def invalidate_content_cache(generator):
+    """
+    Remove pages depending on changed registries or sets from the generator content cache, so that
+    they are read and processed again instead of restoring output rendered from old registry data.
+
+    :param generator: article or page generator
+    :return: nothing
+    """
+
+    cache = getattr(generator, '_cache', None)
+    if not cache or not bpersonnel_dependencies['pages']:
+        return
+
+    if bpersonnel_dependencies.get('changed') is None:
+        bpersonnel_dependencies['changed'] = changed_registry_dependents()
+
+    invalidated = 0
+    for page in bpersonnel_dependencies['changed']:
+        for key in (page, os.path.relpath(page, generator.path)):
+            if key in cache:
+                del cache[key]
+                invalidated += 1
+
+    if bpersonnel_global_settings['debug_processing']:
+        logger.debug(msg='[{plugin_name}] {generator} cache invalidated:[{invalidated}]'.format(
+            plugin_name='bpersonnel',
+            generator=generator.__class__.__name__,
+            invalidated=invalidated
+        ))
+
+
+def has_bpersonnel_markup(html):
+    """
+    Fast pre-scan for bpersonnel and bpersonnel-item divs
+
+    :param html: html content
+    :return: bool
+    """
+
+    return bool(html) and 'bpersonnel' in html and bpersonnel_markup_pattern.search(html) is not None
+
+
+def bpersonnel(content):
+    """
+    Main processing
+
+    """
+
+    if isinstance(content, contents.Static):
+        return
+
+    with PhaseTimer('page', page=getattr(content, 'source_path', None) or getattr(content, 'title', None)):
+        process_content(content)
+
+
+def process_content(content):
+    """
+    Process content object
+
+    """
+
+    page_settings = process_page_metadata(metadata=getattr(content, 'metadata', {}))
+
+    # Render jobs, and their target divs
+    jobs = []
+    targets = []
+
+    # Template variable
+    if page_settings['template-variable']:
+        # We have page variable set, listing is rendered when template outputs it
+        page_settings['show'] = True
+        content.bpersonnel = LazyListing(page_settings)
+
+    else:
+        content.bpersonnel = None
+
+    soup = None
+    if has_bpersonnel_markup(content._content):
+        bpersonnel_page_stats['processed'] += 1
+        with PhaseTimer('soup-parse'):
+            soup = BeautifulSoup(content._content, 'html.parser')
+
+        # bpersonnel divs
+        bpersonnel_divs = soup.find_all('div', class_='bpersonnel')
+        bpersonnel_item_divs = soup.find_all('div', class_='bpersonnel-item')
+
+        if bpersonnel_divs:
+            if page_settings['debug_processing']:
+                logger.debug(msg='[{plugin_name}] title:[{title}] divs:[{div_count}]'.format(
+                    plugin_name='bpersonnel',
+                    title=content.title,
+                    div_count=len(bpersonnel_divs)
+                ))
+
+            page_settings['show'] = True
+
+            for bpersonnel_div in bpersonnel_divs:
+                # We have div in the page
+                jobs.append(('listing', div_settings(bpersonnel_div.attrs, page_settings, bpersonnel_div_parameters['bpersonnel'])))
+                targets.append(bpersonnel_div)
+
+        # bpersonnel card divs
+        if bpersonnel_item_divs:
+            if page_settings['debug_processing']:
+                logger.debug(msg='[{plugin_name}] title:[{title}] divs:[{div_count}]'.format(
+                    plugin_name='bpersonnel-item',
+                    title=content.title,
+                    div_count=len(bpersonnel_item_divs)
+                ))
+
+            page_settings['show'] = True
+
+            for bpersonnel_card_div in bpersonnel_item_divs:
+                # We have div in the page
+                jobs.append(('card', div_settings(bpersonnel_card_div.attrs, page_settings, bpersonnel_div_parameters['bpersonnel-item'])))
+                targets.append(bpersonnel_card_div)
+
+    else:
+        # Skip parsing for content without bpersonnel markup
+        bpersonnel_page_stats['skipped'] += 1
+
+    if page_settings['template-variable']:
+        record_dependencies(page=getattr(content, 'source_path', None), jobs=jobs + [('listing', page_settings)])
+    else:
+        record_dependencies(page=getattr(content, 'source_path', None), jobs=jobs)
+
+    if not jobs:
+        return
+
+    fragments = FragmentSplicer()
+    for target, div_html in zip(targets, bpersonnel_render_backend.render(jobs)):
+        if div_html:
+            target.replaceWith(fragments.add(div_html))
+
+    if soup is not None:
+        with PhaseTimer('soup-serialize'):
+            content._content = fragments.splice(soup.decode())
+
+
+def process_page_metadata(metadata):
+    """
+    Process page metadata into page settings. Settings are resolved per content object from its own
+    metadata, hence processing does not depend on the order in which content is read.
+
+    :param metadata: content metadata
+    :return: page settings (ChainMap)
+    """
+
+    overrides = {}
+    if u'bpersonnel' in metadata and parse_bool(metadata['bpersonnel']):
+        overrides['show'] = True
+        overrides['template-variable'] = True
+    else:
+        overrides['show'] = False
+        overrides['template-variable'] = False
+
+    for name, key in bpersonnel_metadata_parameters.items():
+        if name in metadata:
+            overrides[key] = metadata[name]
+
+    if u'bpersonnel_sort' in metadata and parse_bool(metadata['bpersonnel_sort']):
+        overrides['sort'] = True
+
+    return layered_settings(bpersonnel_global_settings, overrides)
+
+
+def init_default_config(pelican):
+    """
+    Handle settings from pelicanconf.py
+
+    """
+    global bpersonnel_global_settings, bpersonnel_template_environment, bpersonnel_render_backend
+
+    settings = dict(bpersonnel_default_settings)
+    settings['site-url'] = pelican.settings['SITEURL']
+
+    if 'BPERSONNEL_SOURCE' in pelican.settings:
+        settings['data-source'] = pelican.settings['BPERSONNEL_SOURCE']
+
+    if 'BPERSONNEL_TEMPLATE' in pelican.settings:
+        settings['template'] = dict(settings['template'], **pelican.settings['BPERSONNEL_TEMPLATE'])
+
+    if 'BPERSONNEL_ITEM_TEMPLATE' in pelican.settings:
+        settings['item-template'] = dict(settings['item-template'], **pelican.settings['BPERSONNEL_ITEM_TEMPLATE'])
+
+    if 'BPERSONNEL_PAGINATION_TEMPLATE' in pelican.settings:
+        settings['pagination-template'] = pelican.settings['BPERSONNEL_PAGINATION_TEMPLATE']
+
+    if 'BPERSONNEL_GROUP_TEMPLATE' in pelican.settings:
+        settings['group-template'] = dict(settings['group-template'], **pelican.settings['BPERSONNEL_GROUP_TEMPLATE'])
+
+    if 'BPERSONNEL_PERSON_ITEM_TEMPLATE' in pelican.settings:
+        settings['person-item-template'] = pelican.settings['BPERSONNEL_PERSON_ITEM_TEMPLATE']
+
+    if 'BPERSONNEL_HEADER' in pelican.settings:
+        settings['header'] = pelican.settings['BPERSONNEL_HEADER']
+
+    if 'BPERSONNEL_PANEL_COLOR' in pelican.settings:
+        settings['panel-color'] = pelican.settings['BPERSONNEL_PANEL_COLOR']
+
+    if 'BPERSONNEL_SORT' in pelican.settings:
+        settings['sort'] = parse_bool(pelican.settings['BPERSONNEL_SORT'])
+
+    if 'BPERSONNEL_REGISTRY_HASH' in pelican.settings:
+        settings['registry-hash'] = pelican.settings['BPERSONNEL_REGISTRY_HASH']
+
+    if 'BPERSONNEL_TEMPLATE_CACHE_SIZE' in pelican.settings:
+        settings['template-cache-size'] = pelican.settings['BPERSONNEL_TEMPLATE_CACHE_SIZE']
+
+    if 'BPERSONNEL_TEMPLATE_BYTECODE_CACHE_PATH' in pelican.settings:
+        settings['template-bytecode-cache-path'] = pelican.settings['BPERSONNEL_TEMPLATE_BYTECODE_CACHE_PATH']
+
+    if 'BPERSONNEL_NORMALIZE_HTML' in pelican.settings:
+        settings['normalize-html'] = pelican.settings['BPERSONNEL_NORMALIZE_HTML']
+
+    if 'BPERSONNEL_FRAGMENT_CACHE_SIZE' in pelican.settings:
+        settings['fragment-cache-size'] = pelican.settings['BPERSONNEL_FRAGMENT_CACHE_SIZE']
+
+    if pelican.settings.get('BPERSONNEL_DISK_CACHE'):
+        # Persistent cache is keyed by registry content hash
+        settings['disk-cache-path'] = os.path.join(pelican.settings['CACHE_PATH'], 'bpersonnel')
+        settings['registry-hash'] = True
+
+    if 'BPERSONNEL_COMPILED_REGISTRY' in pelican.settings:
+        settings['compiled-registry'] = pelican.settings['BPERSONNEL_COMPILED_REGISTRY']
+
+    if 'BPERSONNEL_DEBUG_PROCESSING' in pelican.settings:
+        settings['debug_processing'] = pelican.settings['BPERSONNEL_DEBUG_PROCESSING']
+
+    if 'BPERSONNEL_TIMING' in pelican.settings:
+        settings['timing'] = pelican.settings['BPERSONNEL_TIMING']
+
+    if 'BPERSONNEL_TIMING_REPORT_FILE' in pelican.settings:
+        settings['timing-report-file'] = pelican.settings['BPERSONNEL_TIMING_REPORT_FILE']
+        settings['timing'] = settings['timing'] or bool(settings['timing-report-file'])
+
+    if 'BPERSONNEL_RENDER_WORKERS' in pelican.settings:
+        settings['render-workers'] = pelican.settings['BPERSONNEL_RENDER_WORKERS']
+
+    if pelican.settings.get('BPERSONNEL_THUMBNAIL_SIZE'):
+        if Image is None:
+            logger.warning('`pelican-bpersonnel` thumbnails require Pillow, thumbnails are not generated')
+        else:
+            settings['thumbnail-size'] = int(pelican.settings['BPERSONNEL_THUMBNAIL_SIZE'])
+            settings['thumbnail-source-path'] = pelican.settings['PATH']
+            settings['thumbnail-output-path'] = pelican.settings['OUTPUT_PATH']
+            settings['thumbnail-cache-path'] = os.path.join(pelican.settings['CACHE_PATH'], 'bpersonnel_thumbnails')
+
+            if 'BPERSONNEL_CARD_THUMBNAIL_SIZE' in pelican.settings:
+                settings['card-thumbnail-size'] = int(pelican.settings['BPERSONNEL_CARD_THUMBNAIL_SIZE'] or 0) or None
+
+            if 'BPERSONNEL_THUMBNAIL_FORMAT' in pelican.settings:
+                settings['thumbnail-format'] = pelican.settings['BPERSONNEL_THUMBNAIL_FORMAT']
+
+            if 'BPERSONNEL_THUMBNAIL_QUALITY' in pelican.settings:
+                settings['thumbnail-quality'] = pelican.settings['BPERSONNEL_THUMBNAIL_QUALITY']
+
+            if 'BPERSONNEL_THUMBNAIL_RETINA' in pelican.settings:
+                settings['thumbnail-retina'] = pelican.settings['BPERSONNEL_THUMBNAIL_RETINA']
+
+            if 'BPERSONNEL_THUMBNAIL_WORKERS' in pelican.settings:
+                settings['thumbnail-workers'] = pelican.settings['BPERSONNEL_THUMBNAIL_WORKERS']
+
+            if 'BPERSONNEL_THUMBNAIL_PATH' in pelican.settings:
+                settings['thumbnail-path'] = pelican.settings['BPERSONNEL_THUMBNAIL_PATH'].strip('/')
+
+    if 'BPERSONNEL_PAGE_SIZE' in pelican.settings:
+        settings['page-size'] = parse_page_size(pelican.settings['BPERSONNEL_PAGE_SIZE'])
+
+    if 'BPERSONNEL_CHUNK_PATH' in pelican.settings:
+        settings['chunk-path'] = pelican.settings['BPERSONNEL_CHUNK_PATH'].strip('/')
+
+    settings['output-path'] = pelican.settings.get('OUTPUT_PATH')
+
+    if 'BPERSONNEL_WARMUP' in pelican.settings:
+        settings['warmup'] = pelican.settings['BPERSONNEL_WARMUP']
+
+    if pelican.settings.get('BPERSONNEL_WARMUP_SCAN'):
+        settings['warmup-scan-path'] = pelican.settings['PATH']
+
+    if 'BPERSONNEL_WARMUP_WORKERS' in pelican.settings:
+        settings['warmup-workers'] = pelican.settings['BPERSONNEL_WARMUP_WORKERS']
+
+    if pelican.settings.get('CACHE_CONTENT'):
+        # Registry dependencies are stored alongside pelican content cache
+        settings['dependency-cache-path'] = pelican.settings['CACHE_PATH']
+
+        if pelican.settings.get('CONTENT_CACHING_LAYER', 'reader') != 'generator' and settings['debug_processing']:
+            # Reader layer caches content before the plugin processes it, pages are always processed
+            # again and there is nothing to invalidate
+            logger.debug(msg='[{plugin_name}] content cache invalidation requires CONTENT_CACHING_LAYER = \'generator\''.format(
+                plugin_name='bpersonnel'
+            ))
+
+    bpersonnel_global_settings = freeze(settings)
+
+    bpersonnel_template_environment = create_template_environment(
+        cache_size=settings['template-cache-size'],
+        bytecode_cache_path=settings['template-bytecode-cache-path']
+    )
+
+    bpersonnel_render_backend.close()
+    if settings['render-workers']:
+        bpersonnel_render_backend = ProcessPoolRenderBackend(workers=settings['render-workers'], settings=bpersonnel_global_settings)
+    else:
+        bpersonnel_render_backend = RenderBackend()
+
+    for stat in bpersonnel_registry_cache_stats:
+        bpersonnel_registry_cache_stats[stat] = 0
+
+    for stat in bpersonnel_template_cache_stats:
+        bpersonnel_template_cache_stats[stat] = 0
+
+    for stat in bpersonnel_page_stats:
+        bpersonnel_page_stats[stat] = 0
+
+    for stat in bpersonnel_fragment_cache_stats:
+        bpersonnel_fragment_cache_stats[stat] = 0
+
+    for stat in bpersonnel_disk_cache_stats:
+        bpersonnel_disk_cache_stats[stat] = 0
+
+    for stat in bpersonnel_thumbnail_stats:
+        bpersonnel_thumbnail_stats[stat] = 0
+
+    photo_exists.cache_clear()
+    bpersonnel_shard_lists.clear()
+
+    # Fragment cache is kept between builds, chunks are kept together with their listing fragments
+    for key in [key for key in bpersonnel_listing_chunks if key not in bpersonnel_fragment_cache]:
+        del bpersonnel_listing_chunks[key]
+
+    bpersonnel_listing_chunks_used.clear()
+
+    with bpersonnel_timing_lock:
+        for timings in bpersonnel_timings.values():
+            timings.clear()
+
+    if bpersonnel_global_settings['disk-cache-path']:
+        load_disk_cache(bpersonnel_global_settings['disk-cache-path'])
+
+    bpersonnel_dependencies['pages'] = {}
+    bpersonnel_dependencies['stamps'] = {}
+    bpersonnel_dependencies['changed'] = None
+    if bpersonnel_global_settings['dependency-cache-path'] and pelican.settings.get('LOAD_CONTENT_CACHE'):
+        load_dependencies(bpersonnel_global_settings['dependency-cache-path'])
+
+    if bpersonnel_global_settings['warmup']:
+        # Registries used in the previous build are known from the stored dependencies
+        sources = set([bpersonnel_global_settings['data-source']] if bpersonnel_global_settings['data-source'] else [])
+        for dependencies in bpersonnel_dependencies['pages'].values():
+            sources.update(dependencies)
+
+        start_registry_warmup(
+            sources=sources,
+            scan_path=bpersonnel_global_settings['warmup-scan-path'],
+            workers=bpersonnel_global_settings['warmup-workers']
+        )
+
+
+def report_statistics(pelican):
+    """
+    Write listing chunks and photo thumbnails, report cache statistics and timing at the end of the
+    build, store persistent cache and shut down render workers
+
+    """
+
+    bpersonnel_render_backend.close()
+    stop_registry_warmup()
+
+    if bpersonnel_listing_chunks_used and bpersonnel_global_settings['output-path']:
+        write_listing_chunks(bpersonnel_global_settings['output-path'])
+
+    if bpersonnel_global_settings['thumbnail-size']:
+        sources = set([bpersonnel_global_settings['data-source']] if bpersonnel_global_settings['data-source'] else [])
+        for dependencies in bpersonnel_dependencies['pages'].values():
+            sources.update(dependencies)
+
+        with PhaseTimer('thumbnails'):
+            generate_thumbnails(sorted(sources))
+
+    if bpersonnel_global_settings['timing']:
+        log_timing_report(timing_report())
+
+        if bpersonnel_global_settings['timing-report-file']:
+            with open(bpersonnel_global_settings['timing-report-file'], 'w', encoding='utf-8') as file:
+                json.dump(timing_report(top=None), file, indent=2)
+
+    if bpersonnel_global_settings['disk-cache-path']:
+        save_disk_cache(bpersonnel_global_settings['disk-cache-path'])
+
+    if bpersonnel_global_settings['dependency-cache-path']:
+        save_dependencies(bpersonnel_global_settings['dependency-cache-path'])
+
+    if bpersonnel_global_settings['debug_processing']:
+        logger.debug(msg='[{plugin_name}] pages processed:[{processed}] skipped:[{skipped}]'.format(
+            plugin_name='bpersonnel',
+            **bpersonnel_page_stats
+        ))
+        logger.debug(msg='[{plugin_name}] registry cache hits:[{hits}] misses:[{misses}] invalidations:[{invalidations}]'.format(
+            plugin_name='bpersonnel',
+            **bpersonnel_registry_cache_stats
+        ))
+        logger.debug(msg='[{plugin_name}] template cache requests:[{requests}] loaded:[{loaded}]'.format(
+            plugin_name='bpersonnel',
+            **bpersonnel_template_cache_stats
+        ))
+
+        requests = bpersonnel_fragment_cache_stats['hits'] + bpersonnel_fragment_cache_stats['misses']
+        logger.debug(msg='[{plugin_name}] fragment cache hits:[{hits}] misses:[{misses}] evictions:[{evictions}] hit rate:[{hit_rate:.1f}%]'.format(
+            plugin_name='bpersonnel',
+            hit_rate=100.0 * bpersonnel_fragment_cache_stats['hits'] / requests if requests else 0.0,
+            **bpersonnel_fragment_cache_stats
+        ))
+
+        if bpersonnel_global_settings['thumbnail-size']:
+            logger.debug(msg='[{plugin_name}] thumbnails photos:[{photos}] encoded:[{encoded}] reused:[{reused}] failed:[{failed}]'.format(
+                plugin_name='bpersonnel',
+                **bpersonnel_thumbnail_stats
+            ))
+
+        if bpersonnel_global_settings['disk-cache-path']:
+            logger.debug(msg='[{plugin_name}] disk cache registries reused:[{registries_reused}] fragments loaded:[{fragments_loaded}]'.format(
+                plugin_name='bpersonnel',
+                **bpersonnel_disk_cache_stats
+            ))
 
 
 def register():
@@ -674,7 +3537,8 @@ def register():
     """
 
     signals.initialized.connect(init_default_config)
-    signals.article_generator_context.connect(process_page_metadata)
-    signals.page_generator_context.connect(process_page_metadata)
+    signals.article_generator_init.connect(invalidate_content_cache)
+    signals.page_generator_init.connect(invalidate_content_cache)
 
     signals.content_object_init.connect(bpersonnel)
+    signals.finalized.connect(report_statistics)